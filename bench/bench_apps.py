@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ.setdefault("RETENTION_SCHEDULE", "false")  # 측정 중에는 보관 스레드를 실행하지 않음
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from fakes import FakeDatabase, make_fake_openai, make_transcript
+import db
+import llm
+
+APPS = ["stream_app.py", "ielts.py", "eval_app.py", "long.py", "short.py", "work.py"]
+
+# 앱이 불러오는 db.execute / llm.get_openai_client 를 현재 시나리오의 가짜 객체로 연결
+# (turns.py, outbox.py 처럼 import 시점에 execute 를 가져가는 모듈도 같은 가짜를 쓰도록 한 단계 거쳐 호출)
+current = {}
+db.execute = lambda sql, params=None, fetch=None: current["db"].execute(sql, params, fetch)
+llm.get_openai_client = lambda: current["openai"]
+from schema import SCHEMA_VERSION  # db.execute 를 바꾼 뒤에 불러와 schema.py 도 가짜를 쓰도록 함
+
+
+# 백분위수 계산 함수 (nearest-rank)
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+# 한 번의 상호작용(스크립트 재실행)에 걸린 시간을 재는 함수
+def timed(at, samples, name):
+    start = time.perf_counter()
+    at.run()
+    samples.setdefault(name, []).append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(f"{name}: {at.exception[0].message}")
+
+
+def click(at, label):
+    next(button for button in at.button if button.label == label).click()
+
+
+def new_app(app, timeout):
+    return AppTest.from_file(os.path.join(ROOT, app), default_timeout=timeout)
+
+
+# stream_app.py / ielts.py: 정보 입력, transcript_length 턴이 쌓인 상태에서 메시지 전송, 제출
+def bench_chat(app, args, transcript_length, samples):
+    at = new_app(app, args.timeout)
+    timed(at, samples, "first_load")
+    at.text_input(key="user_name").input("student")
+    at.text_input(key="user_email").input("student@example.com")
+    click(at, "정보 입력")
+    timed(at, samples, "submit_info")
+
+    at.session_state["messages"] = at.session_state["messages"][:1] + make_transcript(transcript_length)[1:]
+    at.text_area(key="user_input").input("benchmark answer")
+    click(at, "전송")
+    timed(at, samples, "send_turn")
+    click(at, "제출하기")
+    timed(at, samples, "submit")
+
+
+# eval_app.py: 로그인, 기록 선택, 다음 페이지, 더 보기, 평가
+def bench_eval(app, args, transcript_length, samples):
+    at = new_app(app, args.timeout)
+    timed(at, samples, "first_load")
+    at.text_input[0].input(os.environ["PASSWORD"])
+    timed(at, samples, "login")
+
+    record_select = at.selectbox[1]
+    if len(record_select.options) > 1:
+        record_select.select_index(1)
+        timed(at, samples, "select_record")
+    if any(button.label == "다음" for button in at.button):
+        click(at, "다음")
+        timed(at, samples, "next_page")
+    if any(button.label == "더 보기" for button in at.button):
+        click(at, "더 보기")
+        timed(at, samples, "load_more_turns")
+    click(at, "다시 평가하기")
+    timed(at, samples, "evaluate")
+
+
+# long.py: 정보 입력, 테스트 시작, 문제 풀이 채점 (학습/지연 시간은 건너뜀)
+def bench_long(app, args, transcript_length, samples):
+    at = new_app(app, args.timeout)
+    timed(at, samples, "first_load")
+    at.text_input[0].input("student")
+    at.text_input[1].input("student@example.com")
+    click(at, "제출")
+    timed(at, samples, "submit_info")
+    click(at, "테스트 시작")
+    timed(at, samples, "start_test")
+
+    at.session_state.learning_phase = False
+    at.session_state.quiz_phase = True
+    at.session_state.quiz_started = True
+    at.session_state.quiz_start_time = time.time()
+    at.run()
+    answers = ["보상을 최대화하는 행동을 배우는 것", "", "잘 모르겠어요", "탐색은 새로운 시도", "로봇", "보상", "바둑"]
+    for text_input, answer in zip(at.text_input, answers):
+        text_input.input(answer)
+    click(at, "평가하기")
+    timed(at, samples, "evaluate")
+
+
+# short.py: 정보 입력, 테스트 시작 (자극 제시와 응답은 브라우저 컴포넌트에서 처리)
+def bench_short(app, args, transcript_length, samples):
+    at = new_app(app, args.timeout)
+    timed(at, samples, "first_load")
+    at.text_input[0].input("student")
+    at.text_input[1].input("student@example.com")
+    click(at, "Proceed")
+    timed(at, samples, "submit_info")
+    click(at, "테스트 시작")
+    timed(at, samples, "start_test")
+
+
+# work.py: 정보 입력, 모드 선택, 시작
+def bench_work(app, args, transcript_length, samples):
+    at = new_app(app, args.timeout)
+    timed(at, samples, "first_load")
+    at.text_input[0].input("student")
+    at.text_input[1].input("student@example.com")
+    click(at, "Start Test")
+    timed(at, samples, "submit_info")
+    click(at, "Confirm Mode")
+    timed(at, samples, "confirm_mode")
+    click(at, "Start")
+    timed(at, samples, "start_test")
+
+
+SCENARIOS = {
+    "stream_app.py": bench_chat,
+    "ielts.py": bench_chat,
+    "eval_app.py": bench_eval,
+    "long.py": bench_long,
+    "short.py": bench_short,
+    "work.py": bench_work,
+}
+
+
+# 앱별로 (대화 길이, 기록 수) 조합마다 repeats 번 실행
+def run_benchmarks(args):
+    results = []
+    for app in args.apps:
+        transcript_lengths = args.transcript_lengths if app in ("stream_app.py", "ielts.py", "eval_app.py") else [0]
+        record_counts = args.record_counts if app == "eval_app.py" else [0]
+        for transcript_length in transcript_lengths:
+            for record_count in record_counts:
+                samples = {}
+                for _ in range(args.repeats):
+                    current["db"] = FakeDatabase(args.db_latency, record_count, transcript_length, schema_version=SCHEMA_VERSION)
+                    current["openai"] = make_fake_openai(
+                        latency=args.llm_latency, token_delay=args.token_delay, tokens=args.tokens
+                    )
+                    st.cache_resource.clear()
+                    SCENARIOS[app](app, args, transcript_length, samples)
+                for interaction, values in samples.items():
+                    result = {
+                        "app": app,
+                        "interaction": interaction,
+                        "transcript_length": transcript_length,
+                        "record_count": record_count,
+                        **summarize(values),
+                    }
+                    results.append(result)
+                    print(
+                        f"{app:14} {interaction:16} turns={transcript_length:<5} records={record_count:<6} "
+                        f"p50={result['p50_ms']:9.2f}ms p95={result['p95_ms']:9.2f}ms p99={result['p99_ms']:9.2f}ms"
+                    )
+    return results
+
+
+def result_key(result):
+    return (result["app"], result["interaction"], result["transcript_length"], result["record_count"])
+
+
+# 기준 결과보다 p50 이 tolerance 비율 이상 느려진 항목을 찾는 함수
+def find_regressions(results, baseline_path, tolerance):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result_key(result): result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous and result["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions.append({"key": result_key(result), "baseline_p50_ms": previous["p50_ms"], "p50_ms": result["p50_ms"]})
+    return regressions
+
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-rerun benchmark of the Streamlit apps with fake OpenAI and MySQL")
+    parser.add_argument("--apps", nargs="+", default=APPS, choices=APPS)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--transcript-lengths", type=parse_int_list, default=[0, 40, 120])
+    parser.add_argument("--record-counts", type=parse_int_list, default=[50, 1000])
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds before the fake OpenAI responds")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per fake completion")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds per fake MySQL query")
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest timeout per run (seconds)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare p50 against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "streamlit": st.__version__,
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = find_regressions(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
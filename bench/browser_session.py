@@ -0,0 +1,85 @@
+import time
+from urllib.parse import urlencode
+
+from websockets.sync.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+WIDGET_TYPES = ("button", "text_input", "text_area", "number_input", "selectbox")
+FINISHED_EARLY = ForwardMsg.ScriptFinishedStatus.Value("FINISHED_EARLY_FOR_RERUN")
+
+
+# 브라우저 대신 Streamlit 서버의 웹소켓(/_stcore/stream)에 접속하는 세션
+# 브라우저처럼 BackMsg(rerun_script)를 보내고 ForwardMsg 를 받아 위젯 id 와 라벨을 기록
+class BrowserSession:
+    def __init__(self, base_url, query=None, timeout=300):
+        ws_url = base_url.replace("http://", "ws://").rstrip("/") + "/_stcore/stream"
+        self.websocket = connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout)
+        self.timeout = timeout
+        self.query_string = urlencode(query or {})
+        self.page_script_hash = ""
+        self.widgets = {}  # 라벨 -> (위젯 종류, 위젯 id, fragment id)
+        self.values = {}  # 위젯 id -> 보낼 값 (문자열)
+        self.exceptions = []
+
+    def close(self):
+        self.websocket.close()
+
+    # 스크립트를 다시 실행하고 실행이 끝날 때까지 걸린 시간(초)을 반환
+    def rerun(self, trigger=None, fragment_id=""):
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.query_string = self.query_string
+        client_state.page_script_hash = self.page_script_hash
+        client_state.fragment_id = fragment_id
+        for widget_id, value in self.values.items():
+            client_state.widget_states.widgets.append(WidgetState(id=widget_id, string_value=value))
+        if trigger:
+            client_state.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+
+        start = time.perf_counter()
+        self.websocket.send(message.SerializeToString())
+        seen = {}
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(self.websocket.recv(timeout=self.timeout))
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = forward.new_session.page_script_hash
+            elif kind == "delta":
+                self._read_delta(forward.delta, seen)
+            elif kind == "script_finished" and forward.script_finished != FINISHED_EARLY:
+                break
+        elapsed = time.perf_counter() - start
+
+        # 전체 실행이면 이번에 그려진 위젯만 남기고, fragment 실행이면 기존 위젯에 합침
+        if fragment_id:
+            self.widgets.update(seen)
+        else:
+            self.widgets = seen
+        return elapsed
+
+    def _read_delta(self, delta, seen):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.exceptions.append(element.exception.message)
+        elif kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            seen[widget.label] = (kind, widget.id, delta.fragment_id)
+
+    def has(self, label):
+        return label in self.widgets
+
+    # 입력 위젯 값 설정 (다음 rerun 에 함께 전송)
+    def fill(self, label, value):
+        _, widget_id, _ = self.widgets[label]
+        self.values[widget_id] = value
+
+    # 버튼을 누르고 재실행이 끝날 때까지 걸린 시간을 반환 (fragment 안의 버튼이면 fragment 만 재실행)
+    def click(self, label):
+        _, widget_id, fragment_id = self.widgets[label]
+        return self.rerun(trigger=widget_id, fragment_id=fragment_id)
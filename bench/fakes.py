@@ -0,0 +1,151 @@
+import re
+import json
+import random
+import time
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+TABLE_PATTERN = re.compile(r"^\s*(?:INSERT(?:\s+IGNORE)?\s+INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+# 대화 기록 생성 함수 (turns 개의 user/assistant 턴, 시스템 프롬프트 포함)
+def make_transcript(turns, words_per_turn=60):
+    messages = [{"role": "system", "content": "system prompt " * 50}]
+    for index in range(turns):
+        role = "assistant" if index % 2 == 0 else "user"
+        content = " ".join(f"{role}{index}word{word}" for word in range(words_per_turn))
+        messages.append({"role": role, "content": content, "timestamp": "2024-01-01 00:00:00"})
+    return messages
+
+
+# OpenAI chat.completions 를 흉내 내는 가짜 객체 (지연 시간, 토큰 속도, 오류 주입 설정 가능)
+class FakeCompletions:
+    def __init__(self, latency=0.0, token_delay=0.0, tokens=40, error_rate=0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _usage(self, kwargs):
+        prompt_tokens = sum(len(message["content"]) // 4 + 4 for message in kwargs.get("messages", []))
+        return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=self.tokens, total_tokens=prompt_tokens + self.tokens)
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        fail = random.random() < self.error_rate
+        time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("Injected fake OpenAI error")
+
+        tools = kwargs.get("tools")
+        if tools:
+            # 도구 스키마의 필수 인자마다 마지막 허용 값(만점)으로 응답
+            parameters = tools[0]["function"]["parameters"]
+            arguments = {
+                name: parameters["properties"][name].get("enum", ["fake"])[-1]
+                for name in parameters["required"]
+            }
+            tool_call = SimpleNamespace(
+                id="call_fake",
+                type="function",
+                function=SimpleNamespace(name=tools[0]["function"]["name"], arguments=json.dumps(arguments)),
+            )
+            message = SimpleNamespace(role="assistant", content=None, tool_calls=[tool_call])
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="tool_calls")], usage=self._usage(kwargs))
+
+        words = [f"token{index} " for index in range(self.tokens)]
+        if kwargs.get("stream"):
+            return self._stream(words, kwargs)
+        message = SimpleNamespace(role="assistant", content="".join(words), tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=self._usage(kwargs))
+
+    def _stream(self, words, kwargs):
+        for word in words:
+            time.sleep(self.token_delay)
+            delta = SimpleNamespace(content=word, role=None, tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)], usage=None)
+        if (kwargs.get("stream_options") or {}).get("include_usage"):
+            yield SimpleNamespace(choices=[], usage=self._usage(kwargs))
+
+
+def make_fake_openai(**kwargs):
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(**kwargs)))
+
+
+# db.execute 를 대신하는 메모리 내 가짜 데이터베이스
+# 앱이 실제로 보내는 쿼리 모양만 흉내 내고, 쓰기 쿼리는 테이블별 개수만 기록
+# pool_size 를 주면 연결 풀처럼 동시에 실행되는 쿼리 수를 제한
+class FakeDatabase:
+    def __init__(self, latency=0.0, record_count=100, transcript_length=20, pool_size=None, schema_version=0):
+        self.latency = latency
+        self._pool = threading.BoundedSemaphore(pool_size) if pool_size else None
+        self.transcript = json.dumps(make_transcript(transcript_length))
+        start = datetime(2024, 1, 1)
+        self.records = [
+            (record_id, f"student{record_id}", f"student{record_id}@example.com", start + timedelta(minutes=record_id))
+            for record_id in range(1, record_count + 1)
+        ]
+        self.records.sort(key=lambda record: (record[3], record[0]), reverse=True)
+        self.calls = 0
+        self.writes = {}
+        self.active = 0
+        self.max_active = 0
+        self._next_id = record_count + 1
+        self.schema_version = schema_version  # 학생 앱은 스키마를 바꾸지 않으므로 이미 적용된 버전으로 시작
+        self._lock = threading.Lock()
+
+    def execute(self, sql, params=None, fetch=None):
+        if self._pool is not None:
+            with self._pool:
+                return self._execute(sql, params, fetch)
+        return self._execute(sql, params, fetch)
+
+    def _execute(self, sql, params, fetch):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            return self._dispatch(" ".join(sql.split()), params or (), fetch)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _dispatch(self, sql, params, fetch):
+        if sql.startswith("INSERT IGNORE INTO schema_version"):
+            self.schema_version = max(self.schema_version, params[0])
+        if sql.startswith("SELECT MAX(version) FROM schema_version"):
+            return (self.schema_version,)
+        if sql.startswith("SELECT id, name, email, time FROM interview"):
+            records = self.records
+            if "id > %s" in sql:
+                return []
+            if "(time < %s OR (time = %s AND id < %s))" in sql:
+                cursor_time, _, cursor_id = params[-4:-1]
+                records = [r for r in records if r[3] < cursor_time or (r[3] == cursor_time and r[0] < cursor_id)]
+            return records[:params[-1]]
+        if sql.startswith("SELECT COALESCE(MAX(id), 0) FROM interview"):
+            return (max((r[0] for r in self.records), default=0),)
+        if sql.startswith("SELECT COUNT(*)"):
+            return (0,)
+        if sql.startswith("SELECT chat, email, name FROM interview"):
+            return (self.transcript, "student@example.com", "student")
+        if sql.startswith("SELECT role, content, timestamp FROM interview_turn"):
+            return [(m["role"], m["content"], None) for m in json.loads(self.transcript)]
+        if fetch == "all":
+            return []
+        if fetch == "one":
+            return None
+
+        match = TABLE_PATTERN.match(sql)
+        with self._lock:
+            if match:
+                table = match.group(1)
+                self.writes[table] = self.writes.get(table, 0) + 1
+            self._next_id += 1
+            return self._next_id
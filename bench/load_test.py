@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH)
+
+from browser_session import BrowserSession
+
+LONG_ANSWERS = ["보상을 최대화하는 행동을 배우는 것", "", "잘 모르겠어요", "탐색은 새로운 시도", "로봇", "보상", "바둑"]
+
+
+# 백분위수 계산 함수 (nearest-rank, ms)
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return round(ordered[min(index, len(ordered) - 1)] * 1000, 1)
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.load(response)
+
+
+# 주소가 응답할 때까지 기다리는 함수
+def wait_until_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).close()
+            return
+        except Exception:
+            time.sleep(0.3)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+# 포트가 이미 사용 중이면 이전에 실행된 다른 서버를 측정하게 되므로 미리 확인
+def ensure_port_free(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        if sock.connect_ex(("127.0.0.1", port)) == 0:
+            raise RuntimeError(f"Port {port} is already in use")
+
+
+# OpenAI 스텁과 앱 서버를 각각 별도 프로세스로 실행 (스텁의 CPU 사용량이 앱 서버 측정에 섞이지 않도록)
+def start_processes(args):
+    for port in [args.stub_port] + list(range(args.base_port, args.base_port + 4)):
+        ensure_port_free(port)
+    processes = []
+    stub_url = f"http://127.0.0.1:{args.stub_port}/v1"
+    processes.append(subprocess.Popen([
+        sys.executable, os.path.join(BENCH, "openai_stub.py"),
+        "--port", str(args.stub_port),
+        "--latency", str(args.llm_latency),
+        "--token-rate", str(args.token_rate),
+        "--tokens", str(args.tokens),
+        "--error-rate", str(args.error_rate),
+    ], stdout=subprocess.DEVNULL))
+    wait_until_ready(f"{stub_url}/stats")
+
+    # long.py 의 학습/지연 시간은 0초로 두어 측정 중에 기다리지 않도록 함
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=stub_url,
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "load-test"),
+        LONG_LEARNING_DURATION="0",
+        LONG_DELAY_DURATION="0",
+    )
+    servers = {}
+    for offset, app in enumerate(("stream_app.py", "long.py")):
+        port = args.base_port + offset * 2
+        command = [
+            sys.executable, os.path.join(BENCH, "serve_app.py"), app,
+            "--port", str(port),
+            "--stats-port", str(port + 1),
+            "--db-latency", str(args.db_latency),
+            "--db-pool-size", str(args.db_pool_size),
+        ]
+        if args.mysql:
+            command.append("--mysql")
+        output = None if args.server_logs else subprocess.DEVNULL
+        processes.append(subprocess.Popen(command, env=env, stdout=output, stderr=output))
+        servers[app] = {"url": f"http://127.0.0.1:{port}", "stats": f"http://127.0.0.1:{port + 1}"}
+    for server in servers.values():
+        wait_until_ready(f"{server['url']}/_stcore/health")
+    return processes, stub_url, servers
+
+
+# stream_app.py 면담 한 번: 정보 입력(첫 응답), chat_turns 번의 대화, 제출
+def stream_session(index, args, server, latencies):
+    session = BrowserSession(server["url"], timeout=args.timeout)
+    try:
+        session.rerun()
+        session.fill("이름", f"load{index}")
+        session.fill("이메일", f"load{index}@example.com")
+        latencies["turn"].append(session.click("정보 입력"))
+        for turn in range(args.chat_turns):
+            session.fill("You: ", f"answer {turn} from session {index}")
+            latencies["turn"].append(session.click("전송"))
+        latencies["submit"].append(session.click("제출하기"))
+    finally:
+        session.close()
+    if session.exceptions:
+        raise RuntimeError(session.exceptions[0])
+    return args.chat_turns + 1
+
+
+# long.py 검사 한 번: 학습/지연 시간이 0초인 서버에서 정보 입력, 테스트 시작, 문제 풀기, 채점까지 진행
+def long_session(index, args, server, latencies):
+    session = BrowserSession(server["url"], timeout=args.timeout)
+    try:
+        session.rerun()
+        session.fill("이름을 입력하세요:", f"load{index}")
+        session.fill("이메일을 입력하세요:", f"load{index}@example.com")
+        latencies["phase"].append(session.click("제출"))
+        latencies["phase"].append(session.click("테스트 시작"))
+        latencies["phase"].append(session.click("문제 풀기"))
+        questions = [label for label, widget in session.widgets.items() if widget[0] == "text_input"]
+        for label, answer in zip(questions, LONG_ANSWERS):
+            session.fill(label, answer)
+        latencies["long_evaluate"].append(session.click("평가하기"))
+    finally:
+        session.close()
+    if session.exceptions:
+        raise RuntimeError(session.exceptions[0])
+    return 0
+
+
+# 동시 사용자 수 하나에 대한 측정: users 개의 세션을 동시에 시작하고 모두 끝날 때까지 대기
+def run_level(users, args, stub_url, servers):
+    latencies = {"turn": [], "submit": [], "phase": [], "long_evaluate": []}
+    errors = []
+    completed = {"sessions": 0, "turns": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(users)
+    long_users = round(users * args.long_ratio)
+
+    def worker(index):
+        session, app = (long_session, "long.py") if index < long_users else (stream_session, "stream_app.py")
+        own = {name: [] for name in latencies}
+        barrier.wait()
+        try:
+            turns = session(index, args, servers[app], own)
+        except Exception as e:
+            with lock:
+                errors.append(f"{app}: {e}")
+            turns = None
+        with lock:
+            for name, values in own.items():
+                latencies[name].extend(values)
+            if turns is not None:
+                completed["sessions"] += 1
+                completed["turns"] += turns
+
+    before = {app: get_json(f"{server['stats']}/reset") for app, server in servers.items()}
+    stub_before = get_json(f"{stub_url}/stats")
+    start = time.perf_counter()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    duration = time.perf_counter() - start
+    after = {app: get_json(server["stats"]) for app, server in servers.items()}
+    stub_after = get_json(f"{stub_url}/stats")
+    cpu_seconds = sum(after[app]["cpu_seconds"] - before[app]["cpu_seconds"] for app in servers)
+
+    if args.mysql:
+        db_connections = mysql_threads_connected()
+    else:
+        db_connections = sum(stats["db_max_active"] for stats in after.values())
+
+    return {
+        "users": users,
+        "long_users": long_users,
+        "duration_s": round(duration, 2),
+        "completed_sessions": completed["sessions"],
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "sessions_per_s": round(completed["sessions"] / duration, 3),
+        "turns_per_s": round(completed["turns"] / duration, 3),
+        "turn_p50_ms": percentile(latencies["turn"], 50),
+        "turn_p95_ms": percentile(latencies["turn"], 95),
+        "turn_p99_ms": percentile(latencies["turn"], 99),
+        "submit_p95_ms": percentile(latencies["submit"], 95),
+        "long_evaluate_p50_ms": percentile(latencies["long_evaluate"], 50),
+        "long_evaluate_p95_ms": percentile(latencies["long_evaluate"], 95),
+        "server_cpu_percent": round(cpu_seconds / duration * 100, 1),
+        "server_rss_mb": round(sum(stats["rss_mb"] for stats in after.values()), 1),
+        "db_connections": db_connections,
+        "llm_requests": stub_after["requests"] - stub_before["requests"],
+        "llm_errors": stub_after["errors"] - stub_before["errors"],
+        "llm_max_concurrency": stub_after["max_active"],
+    }
+
+
+# 실제 MySQL 을 쓸 때 현재 연결 수 확인 함수
+def mysql_threads_connected():
+    from dotenv import load_dotenv
+    load_dotenv()
+    import db
+    row = db.execute("SHOW STATUS LIKE 'Threads_connected'", fetch="one")
+    return int(row[1]) if row else None
+
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of stream_app.py and long.py against a local OpenAI stub")
+    parser.add_argument("--users", type=parse_int_list, default=[1, 5, 10, 20, 40], help="concurrency levels, e.g. 1,5,10,20")
+    parser.add_argument("--chat-turns", type=int, default=5, help="chat turns per stream_app session after the first reply")
+    parser.add_argument("--long-ratio", type=float, default=0.2, help="share of users running long.py instead of stream_app.py")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds before the stub starts answering")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="streamed tokens per second")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per stub completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub requests answered with HTTP 500")
+    parser.add_argument("--stub-port", type=int, default=8600)
+    parser.add_argument("--base-port", type=int, default=8700, help="first port for the app servers and their stats endpoints")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds per query on the local fake database")
+    parser.add_argument("--db-pool-size", type=int, default=int(os.getenv("DB_POOL_SIZE", "10")))
+    parser.add_argument("--mysql", action="store_true", help="use the MySQL server from .env instead of the local fake database")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for one script run")
+    parser.add_argument("--server-logs", action="store_true", help="show the app servers' output")
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args()
+
+    processes, stub_url, servers = start_processes(args)
+    levels = []
+    try:
+        for users in args.users:
+            level = run_level(users, args, stub_url, servers)
+            levels.append(level)
+            print(
+                f"users={users:<4} sessions/s={level['sessions_per_s']:<7} turns/s={level['turns_per_s']:<7} "
+                f"turn p50/p95/p99={level['turn_p50_ms']}/{level['turn_p95_ms']}/{level['turn_p99_ms']} ms "
+                f"cpu={level['server_cpu_percent']}% rss={level['server_rss_mb']}MB db={level['db_connections']} "
+                f"errors={level['errors']}"
+            )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "levels": levels,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
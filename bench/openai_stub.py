@@ -0,0 +1,177 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# OpenAI 호환 /v1/chat/completions 스텁 서버
+# latency: 첫 응답까지 지연 (초), token_rate: 초당 스트리밍 토큰 수, error_rate: 500 오류를 돌려줄 확률
+class OpenAIStub:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.5, token_rate=50.0, tokens=60, error_rate=0.0):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="openai-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail = random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return fail
+
+    def _leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "active": self.active, "max_active": self.max_active}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self._send_json(200, stub.stats())
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fail = stub._enter()
+                try:
+                    time.sleep(stub.latency)
+                    if fail:
+                        self._send_json(500, {"error": {"message": "Injected stub error", "type": "server_error"}})
+                    elif not self.path.endswith("/chat/completions"):
+                        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    elif body.get("stream"):
+                        self._stream(body)
+                    else:
+                        self._send_json(200, stub.completion(body))
+                finally:
+                    stub._leave()
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in stub.stream_chunks(body):
+                    data = f"data: {chunk}\n\n".encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+    def _usage(self, body):
+        prompt_tokens = sum(len(str(message.get("content") or "")) // 4 + 4 for message in body.get("messages", []))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": self.tokens, "total_tokens": prompt_tokens + self.tokens}
+
+    def _base(self, body, object_type):
+        return {"id": "chatcmpl-stub", "object": object_type, "created": int(time.time()), "model": body.get("model", "stub")}
+
+    def completion(self, body):
+        tools = body.get("tools")
+        if tools:
+            # 도구 스키마의 필수 인자마다 마지막 허용 값으로 응답
+            parameters = tools[0]["function"]["parameters"]
+            arguments = {name: parameters["properties"][name].get("enum", ["stub"])[-1] for name in parameters.get("required", [])}
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": "call_stub",
+                    "type": "function",
+                    "function": {"name": tools[0]["function"]["name"], "arguments": json.dumps(arguments)},
+                }],
+            }
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "".join(f"token{index} " for index in range(self.tokens))}
+            finish_reason = "stop"
+        return {
+            **self._base(body, "chat.completion"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": self._usage(body),
+        }
+
+    def stream_chunks(self, body):
+        base = self._base(body, "chat.completion.chunk")
+        delay = 1 / self.token_rate if self.token_rate else 0
+        for index in range(self.tokens):
+            if index:
+                time.sleep(delay)
+            delta = {"content": f"token{index} "}
+            if index == 0:
+                delta["role"] = "assistant"
+            yield json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        yield json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield json.dumps({**base, "choices": [], "usage": self._usage(body)})
+        yield "[DONE]"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible chat completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = OpenAIStub(args.host, args.port, args.latency, args.token_rate, args.tokens, args.error_rate)
+    print(f"OpenAI stub listening on {stub.base_url} (set OPENAI_BASE_URL to this)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
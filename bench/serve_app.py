@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import argparse
+import resource
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import psutil
+except ImportError:  # psutil이 없으면 메모리는 최대 RSS만 기록
+    psutil = None
+
+from fakes import FakeDatabase
+import db
+
+
+# 서버 프로세스의 CPU 시간, 메모리, DB 연결 수를 돌려주는 통계 서버
+def start_stats_server(port, fake_db):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            if psutil is not None:
+                rss = psutil.Process().memory_info().rss
+            else:
+                rss = usage.ru_maxrss * 1024  # Linux 는 KB 단위
+            stats = {
+                "cpu_seconds": usage.ru_utime + usage.ru_stime,
+                "rss_mb": round(rss / 1024 / 1024, 1),
+                "threads": threading.active_count(),
+            }
+            if fake_db is not None:
+                stats.update(db_calls=fake_db.calls, db_active=fake_db.active, db_max_active=fake_db.max_active)
+                if self.path.startswith("/reset"):
+                    fake_db.max_active = fake_db.active
+            data = json.dumps(stats).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="bench-stats", daemon=True).start()
+
+
+# 앱을 실제 Streamlit 서버로 실행 (MySQL 대신 로컬 가짜 데이터베이스 사용 가능)
+def main():
+    parser = argparse.ArgumentParser(description="Run one of the apps on a Streamlit server for load testing")
+    parser.add_argument("app")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--stats-port", type=int, default=8701)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    parser.add_argument("--db-pool-size", type=int, default=int(os.getenv("DB_POOL_SIZE", "10")))
+    parser.add_argument("--mysql", action="store_true", help="use the MySQL server from .env instead of the local fake database")
+    args = parser.parse_args()
+
+    os.environ.setdefault("RETENTION_SCHEDULE", "false")  # 부하 측정 중에는 보관 스레드를 실행하지 않음
+    fake_db = None
+    if not args.mysql:
+        # turns.py, outbox.py 처럼 import 시점에 execute 를 가져가는 모듈보다 먼저 교체
+        fake_db = FakeDatabase(args.db_latency, record_count=0, transcript_length=0, pool_size=args.db_pool_size)
+        db.execute = fake_db.execute
+        from schema import SCHEMA_VERSION  # db.execute 를 바꾼 뒤에 불러와 schema.py 도 가짜를 쓰도록 함
+        fake_db.schema_version = SCHEMA_VERSION
+    start_stats_server(args.stats_port, fake_db)
+
+    from streamlit.web import cli
+    sys.argv = [
+        "streamlit", "run", os.path.join(ROOT, args.app),
+        "--server.port", str(args.port),
+        "--server.address", "127.0.0.1",
+        "--server.headless", "true",
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+    ]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
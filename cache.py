@@ -0,0 +1,87 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+# 크기 제한(LRU)과 유효 시간(TTL)이 있는 스레드 안전 캐시
+# 같은 키를 여러 스레드가 동시에 불러오면 한 번만 불러오고 결과를 공유
+class LRUTTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        value, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key):
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # 캐시에 있으면 바로 반환하고, 없으면 loader()로 불러와 저장 (None 결과는 저장하지 않음)
+    def get_or_load(self, key, loader):
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = Future()
+                self._loading[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            if value is not None:
+                self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+
+    # 캐시에 없고 불러오는 중도 아니면 executor 에서 미리 불러옴
+    def prefetch(self, key, loader, executor):
+        with self._lock:
+            found, _ = self._lookup(key)
+            if found or key in self._loading:
+                return
+        executor.submit(self.get_or_load, key, loader)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import tempfile
+from types import SimpleNamespace
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+MODES = ("passthrough", "record", "replay")
+
+# 요청 비교에 쓰는 메시지 필드 (timestamp 등 앱에서 붙인 필드는 제외)
+MESSAGE_FIELDS = ("role", "content", "name", "tool_calls", "tool_call_id")
+
+
+# replay 모드에서 저장된 응답이 없을 때 발생하는 오류
+class CassetteMiss(LookupError):
+    pass
+
+
+# 요청을 정규화하는 함수 (None 값과 메시지의 부가 필드를 제거하고 스트리밍 여부만 남김)
+def normalize_request(kwargs):
+    request = {key: value for key, value in kwargs.items() if value is not None and key != "stream_options"}
+    request["stream"] = bool(request.get("stream"))
+    request["messages"] = [
+        {field: message[field] for field in MESSAGE_FIELDS if message.get(field) is not None}
+        for message in request.get("messages", [])
+    ]
+    return request
+
+
+def request_key(request):
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# 요청/응답 쌍을 요청 해시 이름의 JSON 파일로 저장하는 디렉터리
+class Cassette:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    # 임시 파일에 쓴 뒤 교체 (동시에 같은 요청을 기록해도 깨진 파일이 남지 않도록)
+    def save(self, key, request, response):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"request": request, "response": response}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+
+# client.chat.completions.create 를 가로채 기록/재생하는 객체
+# record: 저장된 응답이 있으면 재생하고 없으면 API를 호출해 저장, replay: 저장된 응답만 사용
+class CassetteCompletions:
+    def __init__(self, completions, cassette, mode):
+        self._completions = completions
+        self.cassette = cassette
+        self.mode = mode
+
+    def create(self, **kwargs):
+        request = normalize_request(kwargs)
+        key = request_key(request)
+        entry = self.cassette.load(key)
+        if entry is not None:
+            return self._replay(entry["response"], request["stream"])
+        if self.mode == "replay":
+            raise CassetteMiss(f"No recorded response for request {key} in {self.cassette.directory}")
+
+        response = self._completions.create(**kwargs)
+        if request["stream"]:
+            return self._record_stream(response, key, request)
+        self.cassette.save(key, request, response.model_dump(mode="json"))
+        return response
+
+    def _replay(self, response, stream):
+        if stream:
+            return (ChatCompletionChunk.model_validate(chunk) for chunk in response)
+        return ChatCompletion.model_validate(response)
+
+    # 스트림을 그대로 전달하면서 조각을 모으고, 끝까지 받은 경우에만 저장
+    def _record_stream(self, stream, key, request):
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk.model_dump(mode="json"))
+            yield chunk
+        self.cassette.save(key, request, chunks)
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+# OpenAI 클라이언트를 감싸 chat.completions 만 기록/재생하고 나머지는 그대로 전달
+class CassetteClient:
+    def __init__(self, client, cassette, mode):
+        self._client = client
+        self.chat = SimpleNamespace(completions=CassetteCompletions(client.chat.completions, cassette, mode))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# LLM_CASSETTE_MODE 에 따라 클라이언트를 감싸는 함수 (passthrough 이면 그대로 반환)
+def wrap_client(client, mode=None, directory=None):
+    mode = (mode or os.getenv("LLM_CASSETTE_MODE", "passthrough")).lower()
+    if mode not in MODES:
+        raise ValueError(f"LLM_CASSETTE_MODE must be one of {', '.join(MODES)}, not {mode!r}")
+    if mode == "passthrough":
+        return client
+    directory = directory or os.getenv("LLM_CASSETTE_DIR", "cassettes")
+    return CassetteClient(client, Cassette(directory), mode)
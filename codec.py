@@ -0,0 +1,164 @@
+import json
+import zlib
+import base64
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+import streamlit as st
+from db import execute
+
+CODEC_HEADER = "AIZ1:"  # 압축된 값의 머리말 (머리말이 없으면 예전 방식의 JSON 문자열)
+PROMPT_REF_PREFIX = "@@prompt:"  # 시스템 프롬프트 대신 저장하는 참조의 머리말
+PROMPT_MIN_LENGTH = 200  # 이 길이 이상인 시스템 프롬프트만 참조로 저장
+COMPRESSION_LEVEL = 6
+# 압축해서 저장하는 컬럼 (테이블 -> 컬럼)
+ENCODED_COLUMNS = {
+    "interview": "chat",
+    "ielts": "chat",
+    "cog_table": "user_activity",
+}
+
+_stored_prompts = set()
+_stored_prompts_lock = threading.Lock()
+
+
+# 시스템 프롬프트 보관 테이블 생성 함수 (프로세스당 한 번만 실행)
+@st.cache_resource
+def create_prompt_table():
+    execute("""
+    CREATE TABLE IF NOT EXISTS prompt_store (
+        prompt_hash CHAR(64) PRIMARY KEY,
+        content MEDIUMTEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+# 긴 시스템 프롬프트를 prompt_store 에 한 번만 저장하고 참조 문자열을 반환하는 함수
+def prompt_ref(text):
+    if len(text) < PROMPT_MIN_LENGTH:
+        return text
+    prompt_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _stored_prompts_lock:
+        stored = prompt_hash in _stored_prompts
+    if not stored:
+        create_prompt_table()
+        execute("INSERT IGNORE INTO prompt_store (prompt_hash, content) VALUES (%s, %s)", (prompt_hash, text))
+        with _stored_prompts_lock:
+            _stored_prompts.add(prompt_hash)
+    return PROMPT_REF_PREFIX + prompt_hash
+
+
+# 프롬프트 내용은 해시로 정해지므로 프로세스가 끝날 때까지 캐시
+@lru_cache(maxsize=64)
+def _load_prompt(prompt_hash):
+    create_prompt_table()
+    row = execute("SELECT content FROM prompt_store WHERE prompt_hash = %s", (prompt_hash,), fetch="one")
+    if row is None:
+        raise LookupError(f"Prompt {prompt_hash} is missing from prompt_store")
+    return row[0]
+
+
+# 참조 문자열이면 저장된 프롬프트로, 아니면 그대로 반환
+def resolve_prompt(text):
+    if isinstance(text, str) and text.startswith(PROMPT_REF_PREFIX):
+        return _load_prompt(text[len(PROMPT_REF_PREFIX):])
+    return text
+
+
+def _is_system_message(item):
+    return isinstance(item, dict) and item.get("role") == "system" and isinstance(item.get("content"), str)
+
+
+def _replace_prompts(value):
+    if not isinstance(value, list):
+        return value
+    return [dict(item, content=prompt_ref(item["content"])) if _is_system_message(item) else item for item in value]
+
+
+def _restore_prompts(value):
+    if not isinstance(value, list):
+        return value
+    return [dict(item, content=resolve_prompt(item["content"])) if _is_system_message(item) else item for item in value]
+
+
+# JSON 으로 저장할 값을 컬럼에 넣을 문자열로 변환하는 함수
+# 대화 기록의 시스템 프롬프트는 참조로 바꾸고, 나머지는 zlib 으로 압축해 base64 로 저장
+# 압축해도 작아지지 않는 짧은 값(세션 참조 등)은 그대로 JSON 으로 저장
+def encode_json(value):
+    plain = json.dumps(value)
+    data = json.dumps(_replace_prompts(value), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    encoded = CODEC_HEADER + base64.b64encode(zlib.compress(data, COMPRESSION_LEVEL)).decode("ascii")
+    return encoded if len(encoded) < len(plain) else plain
+
+
+# encode_json 으로 저장한 값과 예전 JSON 문자열을 모두 읽는 함수
+def decode_json(text):
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode("utf-8")
+    if not text.startswith(CODEC_HEADER):
+        return json.loads(text)
+    data = zlib.decompress(base64.b64decode(text[len(CODEC_HEADER):]))
+    return _restore_prompts(json.loads(data))
+
+
+# 예전 방식으로 저장된 행을 batch_size 개씩 새 형식으로 다시 저장하는 함수 (다시 실행해도 안전)
+def recompress_table(table, batch_size=200):
+    column = ENCODED_COLUMNS[table]
+    last_id, converted, saved_bytes = 0, 0, 0
+    while True:
+        rows = execute(
+            f"SELECT id, {column} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size),
+            fetch="all",
+        )
+        if not rows:
+            return converted, saved_bytes
+        for record_id, text in rows:
+            last_id = record_id
+            if text is None or text.startswith(CODEC_HEADER):
+                continue
+            encoded = encode_json(json.loads(text))
+            if encoded == text:
+                continue
+            execute(f"UPDATE {table} SET {column} = %s WHERE id = %s", (encoded, record_id))
+            converted += 1
+            saved_bytes += len(text.encode("utf-8")) - len(encoded)
+
+
+# 저장된 레코드 하나를 풀어서 JSON 으로 내보내는 함수 (결과 테이블에 없으면 보관 테이블에서 찾음)
+# 턴 세션 참조로 저장된 대화는 턴 테이블에서 불러온 전체 대화로 내보냄
+def export_record(table, record_id):
+    from turns import load_chat  # turns 가 codec 을 불러오므로 순환 import 를 피하려고 여기서 불러옴
+    column = ENCODED_COLUMNS[table]
+    for source in (table, f"{table}_archive"):
+        row = execute(f"SELECT {column} FROM {source} WHERE id = %s", (record_id,), fetch="one")
+        if row is not None:
+            return load_chat(row[0])
+    raise LookupError(f"{table} {record_id} not found")
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compress stored transcripts or export one decoded record")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    recompress = subparsers.add_parser("recompress", help="rewrite old rows in the compressed format")
+    recompress.add_argument("--table", choices=list(ENCODED_COLUMNS), action="append")
+    recompress.add_argument("--batch-size", type=int, default=200)
+    export = subparsers.add_parser("export", help="print one record's decoded JSON")
+    export.add_argument("table", choices=list(ENCODED_COLUMNS))
+    export.add_argument("record_id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "recompress":
+        for table in args.table or list(ENCODED_COLUMNS):
+            converted, saved_bytes = recompress_table(table, args.batch_size)
+            print(f"{table}: {converted} rows rewritten, {saved_bytes / 1024 / 1024:.1f} MB saved")
+    else:
+        print(json.dumps(export_record(args.table, args.record_id), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+from functools import lru_cache
+from metrics import record_span
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 글자 수로 토큰 수를 추정
+    tiktoken = None
+
+SUMMARY_PROMPT = (
+    "Summarize the earlier part of the following interview so that the interviewer can continue it. "
+    "Keep which interview tasks have already been covered, the questions that were asked, "
+    "and the key points of the interviewee's answers. Write the summary in the language of the interview."
+)
+
+
+# tiktoken 인코딩을 처음 쓸 때 한 번만 불러오는 함수
+# 인코딩 파일을 내려받을 수 없는 서버(오프라인, 방화벽)에서는 None 을 캐시하고 글자 수 추정을 사용
+@lru_cache(maxsize=1)
+def get_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        record_span("context.encoding", 0, f"{type(e).__name__}: {e}")  # 측정 기록에 실패 원인을 남김
+        return None
+
+
+# 토큰 수 계산 함수
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # 영문은 약 4글자당 1토큰, 한글 등 비ASCII 문자는 글자당 약 1토큰으로 추정
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + 4  # 메시지당 역할 등 부가 토큰
+
+
+# 이전 대화를 기존 요약에 합쳐 새 요약을 만드는 함수
+def summarize_turns(client, model, summary, turns):
+    text = ""
+    if summary:
+        text += f"[Summary so far]: {summary}\n"
+    for turn in turns:
+        speaker = "Interviewee" if turn["role"] == "user" else "Interviewer"
+        text += f"[{speaker}]: {turn['content']}\n"
+
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": text},
+        ],
+        temperature=0.0,
+    )
+    return response.choices[0].message.content
+
+
+# 토큰 예산에 맞춰 API에 보낼 대화 컨텍스트를 만드는 함수
+# 시스템 프롬프트와 최근 대화는 그대로 두고, 예산을 넘는 이전 대화는 누적 요약으로 압축
+# state 에는 요약 내용과 요약된 턴 수가 저장되며, 원본 messages 는 변경하지 않음
+def build_context(client, messages, state, budget=None, keep_recent=None, summary_model=None):
+    budget = budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+    keep_recent = keep_recent or int(os.getenv("CONTEXT_KEEP_RECENT", "8"))
+    summary_model = summary_model or os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+
+    full = [{"role": message["role"], "content": message["content"]} for message in messages]
+    full_tokens = sum(message_tokens(message) for message in full)
+    system, turns = full[0], full[1:]
+
+    summarized = state.get("summarized", 0)
+    summary_tokens = count_tokens(state.get("summary", "")) + 10 if summarized else 0
+    current_tokens = message_tokens(system) + summary_tokens + sum(message_tokens(turn) for turn in turns[summarized:])
+
+    if current_tokens > budget:
+        # 최근 keep_recent 턴만 남기고, 그래도 예산을 넘으면 더 줄임 (마지막 턴은 항상 유지)
+        summary_reserve = summary_tokens + 600
+        split = max(len(turns) - keep_recent, summarized)
+        while (
+            split < len(turns) - 1
+            and message_tokens(system) + summary_reserve + sum(message_tokens(turn) for turn in turns[split:]) > budget
+        ):
+            split += 1
+
+        if split > summarized:
+            state["summary"] = summarize_turns(client, summary_model, state.get("summary", ""), turns[summarized:split])
+            state["summarized"] = summarized = split
+
+    if summarized:
+        summary_message = {"role": "system", "content": f"Summary of the earlier interview:\n{state['summary']}"}
+        context = [system, summary_message] + turns[summarized:]
+    else:
+        context = full
+
+    sent_tokens = sum(message_tokens(message) for message in context)
+    stats = {
+        "full_tokens": full_tokens,
+        "sent_tokens": sent_tokens,
+        "saved_tokens": max(full_tokens - sent_tokens, 0),
+    }
+    return context, stats
@@ -0,0 +1,114 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import errorcode, pooling
+import streamlit as st
+from metrics import span
+
+# 연결이 끊어졌을 때 ("server has gone away" 등) 한 번 더 시도할 오류 코드
+RECONNECT_ERRORS = (
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_CONN_HOST_ERROR,
+)
+
+# 측정 기록에 남길 테이블 이름을 찾는 패턴
+TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+`?(\w+)", re.IGNORECASE)
+
+
+# 서버 프로세스 전체에서 공유하는 MySQL 연결 풀
+# 풀 크기는 .env 의 DB_POOL_SIZE 로 변경 가능 (mysql-connector 최대 32)
+@st.cache_resource
+def get_db_pool():
+    return pooling.MySQLConnectionPool(
+        pool_name="ai4stem_pool",
+        pool_size=min(int(os.getenv("DB_POOL_SIZE", "10")), pooling.CNX_POOL_MAXSIZE),
+        pool_reset_session=True,
+        host=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_DATABASE"),
+    )
+
+
+# 풀에서 연결을 가져오는 함수 (풀이 가득 차 있으면 DB_POOL_TIMEOUT 초까지 대기)
+def _acquire_connection():
+    pool = get_db_pool()
+    deadline = time.monotonic() + float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    while True:
+        try:
+            connection = pool.get_connection()
+            break
+        except pooling.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+    # 헬스 체크: 끊어진 연결이면 다시 연결
+    try:
+        connection.ping(reconnect=True, attempts=3, delay=0.5)
+    except mysql.connector.Error:
+        connection.close()
+        raise
+    return connection
+
+
+# with 블록이 끝나면 연결을 풀에 반환
+@contextmanager
+def get_connection():
+    with span("db.acquire"):
+        connection = _acquire_connection()
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+# 여러 문장을 한 트랜잭션으로 실행 (with 블록 안에서 cursor 로 실행하고, 오류가 나면 모두 되돌림)
+@contextmanager
+def transaction():
+    with span("db.transaction"), get_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            yield cursor
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+# SQL 한 문장을 실행하는 함수 (fetch: None이면 commit, "one" 또는 "all"이면 조회 결과 반환)
+# 실행 시간은 db.<문장 종류> 연산으로 metrics 에 기록
+def execute(sql, params=None, fetch=None):
+    table = TABLE_PATTERN.search(sql)
+    with span(f"db.{sql.split(None, 1)[0].lower()}", table=table.group(1) if table else None):
+        return _execute(sql, params, fetch)
+
+
+# 연결이 끊어지면 조회, 또는 아직 서버에 보내지 않은 문장만 한 번 더 실행
+# (쓰기는 서버가 이미 적용했을 수 있어 다시 실행하면 행이 중복되므로 오류를 그대로 전달)
+def _execute(sql, params, fetch):
+    for attempt in range(2):
+        sent = False
+        try:
+            with get_connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    sent = True
+                    cursor.execute(sql, params)
+                    if fetch == "one":
+                        return cursor.fetchone()
+                    if fetch == "all":
+                        return cursor.fetchall()
+                    connection.commit()
+                    return cursor.lastrowid
+                finally:
+                    cursor.close()
+        except mysql.connector.Error as error:
+            if attempt == 0 and error.errno in RECONNECT_ERRORS and (fetch is not None or not sent):
+                continue
+            raise
@@ -1,22 +1,45 @@
 import streamlit as st
-from openai import OpenAI
 import os
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import mysql.connector
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import markdown
+import mysql.connector
+from cache import LRUTTLCache
+from db import execute
+from ledger import UsageLedger, bind_ledger, create_usage_table, use_ledger
+from llm import get_openai_client
+from metrics import load_spans, record_span, summarize, traced
+from outbox import enqueue_email, fetch_outbox_status, get_outbox_sender
+from retention import fetch_by_id, get_archiver, records_source
+from schema import ensure_schema
+from turns import load_chat
 
 load_dotenv()  # .env 파일 로드
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 MODEL = 'gpt-4o'
 TEMPERATURE = 0.0
+PARALLEL_ASPECTS = True  # 평가 측면별로 요청을 나눠 동시에 생성
+RECORDS_PAGE_SIZE = 50  # 면담 기록 선택 목록의 한 페이지 크기
+TRANSCRIPT_CACHE_SIZE = 200  # 메모리에 보관할 대화 기록 수
+TRANSCRIPT_CACHE_TTL = 10 * 60  # 대화 기록 캐시 유효 시간 (초)
+TRANSCRIPT_WINDOW = 20  # 대화 기록을 한 번에 화면에 그리는 턴 수
+# 둘째/셋째 면담 과제가 시작되는 질문을 찾는 핵심어 (면담 프롬프트의 과제 설명 기준)
+TASK_MARKERS = [
+    ("딜레마", "위기", "dilemma", "crisis"),
+    ("반응", "태도", "reaction", "attitude"),
+]
+RECORDS_POLL_INTERVAL = 30  # 새 면담 기록이 있는지 확인하는 간격 (초)
+METRICS_REFRESH_INTERVAL = 5  # 성능 측정 화면을 다시 그리는 간격 (초)
+EVAL_WORKER_LIMIT = 32  # 일괄 평가 동시 요청 수 입력의 최댓값
+EVAL_MAX_WORKERS = min(max(int(os.getenv('EVAL_MAX_WORKERS', '4')), 1), EVAL_WORKER_LIMIT)  # 일괄 평가 시 동시 요청 수 기본값
+USAGE_DAYS = 30  # 일별 비용 표에 보여주는 기간 (일)
 
-# OpenAI API 설정
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# OpenAI API 설정 (프로세스 전체에서 공유하는 클라이언트)
+client = get_openai_client()
 
 # 평가 프롬프트 설정
 evaluation_prompt_kr = (
@@ -33,78 +56,466 @@ evaluation_prompt_en = (
     "If there are no strengths or areas for improvement, indicate them as 'None'."
 )
 
+# 측면별 평가 프롬프트 설정 (PARALLEL_ASPECTS 모드에서 사용, 이 순서대로 결과를 합침)
+evaluation_aspects_kr = [
+    ("인공지능 이해 능력", "인공지능의 이론이나 원리, 개념에 대한 이해 능력"),
+    ("문제 해결 능력", "인공지능을 활용한 교육 현장의 문제 해결 능력"),
+    ("학습의 본질에 대한 이해", "인공지능 도입에 따른 학습의 본질에 대한 이해"),
+]
+
+evaluation_aspects_en = [
+    ("Understanding of AI", "understanding of AI theories, principles, and concepts"),
+    ("Problem-Solving Skills", "problem-solving skills using AI in educational settings"),
+    ("Understanding of Learning", "comprehension of the fundamental changes in learning brought about by the introduction of AI"),
+]
+
+aspect_prompt_kr = (
+    "다음은 인공지능을 이용해 사람과 면담한 기록이야. "
+    "질문에 대한 응답 내용을 토대로 면담자의 {aspect}만 평가해 줘."
+    "총평, 장점, 개선할 점 이렇게 3가지로 나눠서 평가 결과를 제시하고, 평가 측면의 제목은 쓰지 마."
+    "장점이나 개선할 점이 없다면 '없음'으로 표시해."
+)
+
+aspect_prompt_en = (
+    "The following is a record of an interview conducted using artificial intelligence."
+    "Based on their responses to the questions, please evaluate only the interviewee's {aspect}."
+    "Please provide the evaluation results by dividing them into three parts: an overall assessment, strengths, and areas for improvement, without a heading for the aspect itself."
+    "If there are no strengths or areas for improvement, indicate them as 'None'."
+)
+
 # 언어 선택 (기본값: 한국어)
 language = st.selectbox("언어를 선택하세요 / Please select a language", ("한국어", "English"), index=0)
 
 # 언어에 따른 텍스트 설정
 if language == "English":
     evaluation_prompt = evaluation_prompt_en
+    evaluation_aspects = [(heading, aspect_prompt_en.format(aspect=aspect)) for heading, aspect in evaluation_aspects_en]
     title = "Interview Record Evaluation"
     password_label = "Enter your password"
     select_record_label = "Please select the interview record to evaluate:"
     refresh_button_label = "Refresh"
+    search_label = "Search by name or email"
+    date_range_label = "Date range"
+    previous_page_label = "Previous"
+    next_page_label = "Next"
+    new_records_message = "New interview records have been submitted. Press Refresh to load them:"
+    transcript_cache_label = "Transcript cache"
     evaluation_section_title = "Student's Conversation Record"
+    transcript_section_titles = ["Introduction", "Task 1: AI knowledge", "Task 2: Problem solving", "Task 3: Changes in learning"]
+    jump_to_turn_label = "Jump to turn"
+    jump_button_label = "Go"
+    load_more_label = "Load more"
+    turns_shown_label = "Turns shown"
     evaluate_button_label = "Evaluate"
+    reevaluate_button_label = "Re-evaluate"
     send_button_label = "Send"
-    success_message = "The evaluation has been successfully sent to"
+    queued_message = "The evaluation has been queued for sending to"
     error_message = "The selected record could not be found."
     wrong_password_message = "The password is incorrect."
+    schema_error_message = "The database schema could not be updated. Run python schema.py and check the error:"
     evaluation_result_title = "### Evaluation Result"
     evaluation_email_subject = "Interview Evaluation Result"
+    bulk_section_title = "Bulk Evaluation"
+    bulk_select_label = "Records to evaluate"
+    bulk_unevaluated_label = "Select all records without an evaluation"
+    bulk_workers_label = "Concurrent evaluations"
+    bulk_send_label = "Send emails after evaluation"
+    bulk_run_label = "Run bulk evaluation"
+    bulk_empty_message = "There are no records to evaluate."
+    bulk_done_message = "Bulk evaluation finished."
+    status_pending = "Pending"
+    status_evaluated = "Evaluated"
+    status_queued = "Queued for email"
+    outbox_section_title = "Email Delivery Status"
+    status_failed = "Failed"
+    metrics_section_title = "Performance"
+    metrics_window_label = "Last minutes"
+    metrics_empty_message = "No measurements in this period."
+    metrics_show_label = "Show measurements"
+    usage_section_title = "Token Usage and Cost"
+    usage_cohort_label = "Current search (cohort)"
+    usage_candidates_label = "Per candidate (current page)"
+    usage_daily_label = "Per day"
+    usage_show_label = "Show usage"
+    usage_cohort_template = "{count} interviews, interview cost ${interview_cost:.4f}, evaluation cost ${evaluation_cost:.4f}"
 else:
     evaluation_prompt = evaluation_prompt_kr
+    evaluation_aspects = [(heading, aspect_prompt_kr.format(aspect=aspect)) for heading, aspect in evaluation_aspects_kr]
     title = "면담 기록 평가"
     password_label = "비밀번호를 입력하세요"
     select_record_label = "평가할 면담 기록을 선택하세요:"
     refresh_button_label = "새로고침"
+    search_label = "이름 또는 이메일 검색"
+    date_range_label = "날짜 범위"
+    previous_page_label = "이전"
+    next_page_label = "다음"
+    new_records_message = "새로 제출된 면담 기록이 있습니다. 새로고침을 누르면 불러옵니다:"
+    transcript_cache_label = "대화 기록 캐시"
     evaluation_section_title = "학생의 대화 기록"
+    transcript_section_titles = ["자기 소개", "첫째 과제: 인공지능 지식", "둘째 과제: 문제 해결", "셋째 과제: 학습 관점의 변화"]
+    jump_to_turn_label = "턴으로 이동"
+    jump_button_label = "이동"
+    load_more_label = "더 보기"
+    turns_shown_label = "표시된 턴"
     evaluate_button_label = "평가하기"
+    reevaluate_button_label = "다시 평가하기"
     send_button_label = "전송하기"
-    success_message = "평가 결과가 성공적으로 전송되었습니다."
+    queued_message = "평가 결과가 전송 대기열에 추가되었습니다:"
     error_message = "선택된 기록을 찾을 수 없습니다."
     wrong_password_message = "비밀번호가 틀렸습니다."
+    schema_error_message = "데이터베이스 스키마를 갱신하지 못했습니다. python schema.py 를 실행해 오류를 확인하세요:"
     evaluation_result_title = "### 평가 결과"
     evaluation_email_subject = "면담 평가 결과"
+    bulk_section_title = "일괄 평가"
+    bulk_select_label = "평가할 면담 기록"
+    bulk_unevaluated_label = "평가되지 않은 기록 모두 선택"
+    bulk_workers_label = "동시 평가 수"
+    bulk_send_label = "평가 후 이메일 전송"
+    bulk_run_label = "일괄 평가 실행"
+    bulk_empty_message = "평가할 기록이 없습니다."
+    bulk_done_message = "일괄 평가가 완료되었습니다."
+    status_pending = "대기"
+    status_evaluated = "평가 완료"
+    status_queued = "이메일 전송 대기"
+    outbox_section_title = "이메일 전송 상태"
+    status_failed = "실패"
+    metrics_section_title = "성능 측정"
+    metrics_window_label = "최근 몇 분"
+    metrics_empty_message = "이 기간에 측정된 기록이 없습니다."
+    metrics_show_label = "측정 기록 보기"
+    usage_section_title = "토큰 사용량 및 비용"
+    usage_cohort_label = "현재 검색 조건 (기수)"
+    usage_candidates_label = "응시자별 (현재 페이지)"
+    usage_daily_label = "일별"
+    usage_show_label = "사용량 보기"
+    usage_cohort_template = "면담 {count}건, 면담 비용 ${interview_cost:.4f}, 평가 비용 ${evaluation_cost:.4f}"
 
 # MySQL에서 데이터 불러오기 함수
-def fetch_records():
-    db = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        passwd=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_DATABASE")
-    )
-    cursor = db.cursor()
-    cursor.execute("SELECT id, name, email, time FROM interview")
-    records = cursor.fetchall()
-    cursor.close()
-    db.close()
-    return records
+# 검색 조건을 SQL WHERE 조건으로 바꾸는 함수
+def record_filter_conditions(search="", date_from=None, date_to=None):
+    conditions, params = [], []
+    if search:
+        conditions.append("(name LIKE %s OR email LIKE %s)")
+        params += [f"{search}%", f"{search}%"]
+    if date_from:
+        conditions.append("time >= %s")
+        params.append(datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        conditions.append("time < %s")
+        params.append(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return conditions, params
+
+# search 는 이름/이메일 앞부분, cursor 는 이전 페이지 마지막 레코드의 (time, id)
+# 최신순으로 limit 개를 반환하고, 다음 페이지가 있는지 함께 반환
+def fetch_records(search="", date_from=None, date_to=None, cursor=None, limit=RECORDS_PAGE_SIZE):
+    conditions, params = record_filter_conditions(search, date_from, date_to)
+    if cursor:
+        conditions.append("(time < %s OR (time = %s AND id < %s))")
+        params += [cursor[0], cursor[0], cursor[1]]
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    source = records_source("interview", "id, name, email, time", date_from)
+    sql = f"SELECT id, name, email, time FROM {source} {where} ORDER BY time DESC, id DESC LIMIT %s"
+    params.append(limit + 1)  # 한 개 더 불러와 다음 페이지 여부 확인
+    records = execute(sql, tuple(params), fetch="all")
+    return records[:limit], len(records) > limit
+
+# 이미 불러온 가장 큰 id 이후에 추가된 면담 기록만 불러오는 함수 (기본 키 범위 조회)
+def fetch_new_records(after_id, search="", date_from=None, date_to=None):
+    conditions, params = record_filter_conditions(search, date_from, date_to)
+    conditions.append("id > %s")
+    params.append(after_id)
+    sql = f"SELECT id, name, email, time FROM interview WHERE {' AND '.join(conditions)} ORDER BY time DESC, id DESC"
+    return execute(sql, tuple(params), fetch="all")
+
+# 검색 조건에 맞는 새로 추가된 면담 기록 수 확인 함수 (새로고침으로 불러올 기록과 같은 조건)
+def count_new_records(after_id, search="", date_from=None, date_to=None):
+    conditions, params = record_filter_conditions(search, date_from, date_to)
+    conditions.append("id > %s")
+    params.append(after_id)
+    return execute(f"SELECT COUNT(*) FROM interview WHERE {' AND '.join(conditions)}", tuple(params), fetch="one")[0]
+
+# 검색 조건에 맞는 면담 기록 중 가장 큰 id (새 기록은 결과 테이블에만 추가되므로 보관 테이블은 보지 않음)
+def fetch_max_record_id(search="", date_from=None, date_to=None):
+    conditions, params = record_filter_conditions(search, date_from, date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return execute(f"SELECT COALESCE(MAX(id), 0) FROM interview {where}", tuple(params), fetch="one")[0]
+
+# 현재 검색 조건과 페이지 위치로 면담 기록 목록을 불러오는 함수
+def load_records_page():
+    search, date_from, date_to = st.session_state.record_filter
+    records, has_next = fetch_records(search, date_from, date_to, cursor=st.session_state.page_cursors[-1])
+    st.session_state.records = records
+    st.session_state.has_next_page = has_next
+
+# 새로고침: 새로 추가된 기록만 불러와 첫 페이지 목록에 합치는 함수
+def refresh_records():
+    search, date_from, date_to = st.session_state.record_filter
+    new_records = fetch_new_records(st.session_state.max_record_id, search, date_from, date_to)
+    if not new_records:
+        return
+    st.session_state.max_record_id = max(record[0] for record in new_records)
+    if len(st.session_state.page_cursors) == 1:
+        records = sorted(new_records + st.session_state.records, key=lambda record: (record[3], record[0]), reverse=True)
+        if len(records) > RECORDS_PAGE_SIZE:
+            st.session_state.has_next_page = True
+        st.session_state.records = records[:RECORDS_PAGE_SIZE]
+
+# 일정 간격으로 새 면담 기록이 있는지 가볍게 확인해 알려주는 부분
+@st.fragment(run_every=RECORDS_POLL_INTERVAL)
+def show_new_records_notice():
+    new_count = count_new_records(st.session_state.max_record_id, *st.session_state.record_filter)
+    if new_count:
+        st.info(f"{new_records_message} {new_count}")
+
+# 검색 조건에 맞는 면담 기록의 면담 비용과 평가 비용 합계를 계산하는 함수
+# (목록과 같이 조회 시작 날짜가 보관 기준 이전이면 보관 테이블의 기록도 포함)
+def fetch_cohort_usage(search="", date_from=None, date_to=None):
+    create_usage_table()
+    conditions, params = record_filter_conditions(search, date_from, date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    source = records_source("interview", "id, name, email, time, cost_usd", date_from)
+    count, interview_cost = execute(f"SELECT COUNT(*), COALESCE(SUM(cost_usd), 0) FROM {source} {where}", tuple(params), fetch="one")
+    evaluation_cost = execute(f"""
+    SELECT COALESCE(SUM(u.cost_usd), 0) FROM llm_usage u
+    JOIN {source} ON u.app = 'eval_app' AND u.record_table = 'interview' AND u.record_id = interview.id
+    {where}
+    """, tuple(params), fetch="one")[0]
+    return {"count": count, "interview_cost": float(interview_cost), "evaluation_cost": float(evaluation_cost)}
+
+# 면담 기록별 토큰 수와 면담/평가 비용을 불러오는 함수 (date_from 은 목록과 같은 보관 테이블 포함 기준)
+def fetch_candidate_usage(record_ids, date_from=None):
+    if not record_ids:
+        return []
+    create_usage_table()
+    placeholders = ", ".join(["%s"] * len(record_ids))
+    source = records_source("interview", "id, name, email, prompt_tokens, completion_tokens, cost_usd", date_from)
+    rows = execute(f"""
+    SELECT interview.id, interview.name, interview.email, interview.prompt_tokens, interview.completion_tokens,
+           interview.cost_usd, COALESCE(SUM(u.cost_usd), 0)
+    FROM {source}
+    LEFT JOIN llm_usage u ON u.app = 'eval_app' AND u.record_table = 'interview' AND u.record_id = interview.id
+    WHERE interview.id IN ({placeholders})
+    GROUP BY interview.id, interview.name, interview.email, interview.prompt_tokens, interview.completion_tokens, interview.cost_usd
+    ORDER BY interview.id DESC
+    """, tuple(record_ids), fetch="all")
+    return [
+        {
+            "name": name, "email": email, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "interview_cost_usd": float(interview_cost), "evaluation_cost_usd": float(evaluation_cost),
+        }
+        for _, name, email, prompt_tokens, completion_tokens, interview_cost, evaluation_cost in rows
+    ]
+
+# 최근 days 일 동안의 앱별 일일 토큰 수와 비용을 불러오는 함수
+def fetch_daily_usage(days=USAGE_DAYS):
+    create_usage_table()
+    rows = execute("""
+    SELECT DATE(created_at) AS day, app, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd)
+    FROM llm_usage WHERE created_at >= %s
+    GROUP BY day, app ORDER BY day DESC, app
+    """, (datetime.now() - timedelta(days=days),), fetch="all")
+    return [
+        {
+            "day": day, "app": app, "calls": calls, "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens), "cost_usd": float(cost),
+        }
+        for day, app, calls, prompt_tokens, completion_tokens, cost in rows
+    ]
+
+# 선택 목록에 표시할 면담 기록 이름
+def record_label(record):
+    return f"{record[1]} ({record[2]}) - {record[3]}"
 
 # MySQL에서 특정 레코드 불러오기 함수
+# 반환값의 대화 기록은 이미 파싱된 리스트
+def load_record_by_id(record_id):
+    record = fetch_by_id("interview", "chat, email, name", record_id)  # 지난 학기 기록은 보관 테이블에서 찾음
+    if record is None:
+        return None
+    chat, email, name = record
+    # 턴 단위로 저장된 면담은 턴 테이블에서 대화 기록을 다시 구성
+    return load_chat(chat), email, name
+
+# 프로세스 전체에서 공유하는 대화 기록 캐시 (레코드 id 기준)
+@st.cache_resource
+def get_transcript_cache():
+    return LRUTTLCache(maxsize=TRANSCRIPT_CACHE_SIZE, ttl=TRANSCRIPT_CACHE_TTL)
+
+# 앞뒤 기록을 미리 불러오는 백그라운드 스레드 풀
+@st.cache_resource
+def get_prefetch_executor():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="transcript-prefetch")
+
+# 캐시를 거쳐 면담 기록을 불러오는 함수
 def fetch_record_by_id(record_id):
-    db = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        passwd=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_DATABASE")
+    return get_transcript_cache().get_or_load(record_id, lambda: load_record_by_id(record_id))
+
+# 목록에서 선택된 기록의 이전/다음 기록을 미리 불러오는 함수
+def prefetch_neighbour_records(records, record_id):
+    ids = [record[0] for record in records]
+    if record_id not in ids:
+        return
+    index = ids.index(record_id)
+    for neighbour_id in ids[max(index - 1, 0):index + 2]:
+        if neighbour_id != record_id:
+            get_transcript_cache().prefetch(neighbour_id, lambda rid=neighbour_id: load_record_by_id(rid), get_prefetch_executor())
+
+# 형식을 입힌 대화 기록 조각을 보관하는 캐시 (재실행마다 다시 만들지 않도록)
+@st.cache_resource
+def get_render_cache():
+    return LRUTTLCache(maxsize=TRANSCRIPT_CACHE_SIZE * 10, ttl=TRANSCRIPT_CACHE_TTL)
+
+# 대화 한 턴을 마크다운으로 만드는 함수 (턴 번호 포함)
+def format_turn(index, message):
+    speaker = "You" if message["role"] == "user" else "AI"
+    return f"**{index + 1}. {speaker}** ({message.get('timestamp', '')}): {message['content']}"
+
+# start 부터 end 전까지의 턴을 하나의 마크다운으로 만드는 함수 (캐시 사용)
+def render_turns(record_id, turns, start, end):
+    return get_render_cache().get_or_load(
+        (record_id, start, end),
+        lambda: "\n\n".join(format_turn(index, turns[index]) for index in range(start, end)),
     )
-    cursor = db.cursor()
-    cursor.execute("SELECT chat, email, name FROM interview WHERE id = %s", (record_id,))
-    record = cursor.fetchone()
-    cursor.close()
-    db.close()
-    
-    return record
 
-# OpenAI GPT-4로 평가 생성 함수
-def get_evaluation(chat):
-    messages = [{"role": "system", "content": "You are an expert to evaluate human abilities relevant to AI and Education."}]
+# 대화 기록을 면담 과제별 구간으로 나누고 각 구간의 시작 위치를 반환하는 함수
+# 자기 소개 답변 다음 질문부터 첫째 과제로 보고, 둘째/셋째 과제는 질문의 핵심어로 시작 위치를 찾음
+def split_task_sections(turns):
+    assistant_indexes = [index for index, turn in enumerate(turns) if turn["role"] == "assistant"]
+    starts = [0]
+    if len(assistant_indexes) < 2:
+        return starts
+    starts.append(assistant_indexes[1])
+    for markers in TASK_MARKERS:
+        next_start = next(
+            (index for index in assistant_indexes
+             if index > starts[-1] and any(marker in turns[index]["content"].lower() for marker in markers)),
+            None,
+        )
+        if next_start is None:
+            break
+        starts.append(next_start)
+    return starts
 
-    conversation = json.loads(chat)
-    # 텍스트로 변환
-    text = f"{evaluation_prompt}\n"
-    
+# 대화 기록을 과제별로 접을 수 있게 보여주는 함수
+# 처음에는 TRANSCRIPT_WINDOW 턴만 그리고, 더 보기/턴 이동으로 필요한 만큼만 더 그림
+@st.fragment
+def transcript_viewer(record_id, chat):
+    turns = [message for message in chat if message["role"] in ("user", "assistant")]
+    if not turns:
+        return
+    shown_key = f"transcript_shown_{record_id}"
+    focus_key = f"transcript_focus_{record_id}"
+    shown = st.session_state.get(shown_key, TRANSCRIPT_WINDOW)
+
+    col1, col2 = st.columns([4, 1], vertical_alignment="bottom")
+    with col1:
+        jump_to = st.number_input(jump_to_turn_label, min_value=1, max_value=len(turns), step=1, key=f"jump_{record_id}")
+    with col2:
+        if st.button(jump_button_label, key=f"jump_button_{record_id}"):
+            # 이동할 턴이 들어 있는 창까지 불러오고 그 구간을 펼침
+            shown = max(shown, -(-int(jump_to) // TRANSCRIPT_WINDOW) * TRANSCRIPT_WINDOW)
+            st.session_state[focus_key] = int(jump_to) - 1
+
+    sections_area = st.container()
+    col1, col2 = st.columns([4, 1], vertical_alignment="center")
+    with col2:
+        if shown < len(turns) and st.button(load_more_label, key=f"load_more_{record_id}"):
+            shown += TRANSCRIPT_WINDOW
+            st.session_state[focus_key] = shown - TRANSCRIPT_WINDOW
+    st.session_state[shown_key] = shown
+    visible = min(shown, len(turns))
+    with col1:
+        st.caption(f"{turns_shown_label}: {visible} / {len(turns)}")
+
+    focus = st.session_state.get(focus_key, visible - 1)
+    starts = split_task_sections(turns)
+    with sections_area:
+        for section, start in enumerate(starts):
+            if start >= visible:
+                break
+            end = starts[section + 1] if section + 1 < len(starts) else len(turns)
+            stop = min(end, visible)
+            with st.expander(f"{transcript_section_titles[section]} ({start + 1}-{end})", expanded=start <= focus < end):
+                # 캐시 키가 바뀌지 않도록 TRANSCRIPT_WINDOW 경계에 맞춰 나눠 그림
+                position = start
+                while position < stop:
+                    chunk_end = min((position // TRANSCRIPT_WINDOW + 1) * TRANSCRIPT_WINDOW, stop)
+                    st.markdown(render_turns(record_id, turns, position, chunk_end))
+                    position = chunk_end
+
+# 평가 캐시 및 평가 결과 테이블 생성 함수 (프로세스당 한 번만 실행)
+@st.cache_resource
+def create_evaluation_tables():
+    execute("""
+    CREATE TABLE IF NOT EXISTS evaluation_cache (
+        cache_key CHAR(64) PRIMARY KEY,
+        model VARCHAR(64) NOT NULL,
+        evaluation MEDIUMTEXT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """)
+    execute("""
+    CREATE TABLE IF NOT EXISTS interview_evaluation (
+        record_id INT PRIMARY KEY,
+        evaluation MEDIUMTEXT NOT NULL,
+        evaluated_at DATETIME NOT NULL
+    )
+    """)
+
+# 대화 내용, 평가 프롬프트, 모델로 평가 캐시 키를 만드는 함수
+def evaluation_cache_key(conversation):
+    payload = json.dumps(
+        {
+            "chat": conversation,
+            "prompt": evaluation_aspects if PARALLEL_ASPECTS else evaluation_prompt,
+            "model": MODEL,
+            "temperature": TEMPERATURE,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# 캐시된 평가 결과 불러오기 함수
+def fetch_cached_evaluation(cache_key):
+    create_evaluation_tables()
+    row = execute("SELECT evaluation FROM evaluation_cache WHERE cache_key = %s", (cache_key,), fetch="one")
+    return row[0] if row else None
+
+# 평가 결과를 캐시에 저장하는 함수
+def save_cached_evaluation(cache_key, evaluation):
+    create_evaluation_tables()
+    sql = """
+    INSERT INTO evaluation_cache (cache_key, model, evaluation, created_at)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE evaluation = VALUES(evaluation), created_at = VALUES(created_at)
+    """
+    execute(sql, (cache_key, MODEL, evaluation, datetime.now()))
+
+# 면담 기록별 평가 결과 저장 함수
+def save_record_evaluation(record_id, evaluation):
+    create_evaluation_tables()
+    sql = """
+    INSERT INTO interview_evaluation (record_id, evaluation, evaluated_at)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE evaluation = VALUES(evaluation), evaluated_at = VALUES(evaluated_at)
+    """
+    execute(sql, (record_id, evaluation, datetime.now()))
+
+# 아직 평가되지 않은 면담 기록 불러오기 함수
+def fetch_unevaluated_records():
+    create_evaluation_tables()
+    return execute("""
+    SELECT i.id, i.name, i.email, i.time FROM interview i
+    LEFT JOIN interview_evaluation e ON e.record_id = i.id
+    WHERE e.record_id IS NULL
+    ORDER BY i.time DESC, i.id DESC
+    """, fetch="all")
+
+# 대화 기록을 평가용 텍스트로 변환하는 함수
+def conversation_to_text(conversation):
+    text = ""
     for entry in conversation:
         timestamp = entry.get("timestamp", "")
         if entry['role'] == 'system':
@@ -113,50 +524,127 @@ def get_evaluation(chat):
             text += f"[User] ({timestamp}): {entry['content']}\n"
         elif entry['role'] == 'assistant':
             text += f"[Assistant] ({timestamp}): {entry['content']}\n"
+    return text
+
+# 평가 프롬프트 하나로 GPT-4 평가를 요청하는 함수
+def request_evaluation(prompt, transcript):
+    messages = [
+        {"role": "system", "content": "You are an expert to evaluate human abilities relevant to AI and Education."},
+        {"role": "user", "content": f"{prompt}\n{transcript}"},
+    ]
 
-    messages.append({"role": "user", "content": text})
-        
     response = client.chat.completions.create(
         model=MODEL,
         messages=messages,
         temperature=TEMPERATURE
     )
-    
-    evaluation = response.choices[0].message.content
+
+    return response.choices[0].message.content
+
+# 면담 기록 하나를 평가하는 데 쓴 토큰을 기록할 장부
+def evaluation_ledger(record_id):
+    return UsageLedger("eval_app", f"eval:{record_id}", "interview", record_id)
+
+# OpenAI GPT-4로 평가 생성 함수 (reevaluate=True 이면 캐시를 무시하고 다시 평가)
+@traced("get_evaluation")
+def get_evaluation(conversation, reevaluate=False):
+    cache_key = evaluation_cache_key(conversation)
+    if not reevaluate:
+        cached = fetch_cached_evaluation(cache_key)
+        if cached is not None:
+            return cached
+
+    # 텍스트로 변환
+    transcript = conversation_to_text(conversation)
+
+    if PARALLEL_ASPECTS:
+        # 측면별 요청을 동시에 보내고 정해진 순서대로 결과를 합침
+        with ThreadPoolExecutor(max_workers=len(evaluation_aspects)) as executor:
+            results = list(executor.map(bind_ledger(lambda aspect: request_evaluation(aspect[1], transcript)), evaluation_aspects))
+        evaluation = "\n\n".join(
+            f"### {heading}\n\n{result}" for (heading, _), result in zip(evaluation_aspects, results)
+        )
+    else:
+        evaluation = request_evaluation(evaluation_prompt, transcript)
+
+    save_cached_evaluation(cache_key, evaluation)
     
     return evaluation
 
-# 이메일로 평가 결과 전송 함수
-def send_email(recipient_email, name, subject, body):
-    print(recipient_email, name, subject)
-    
-    sender_email = os.getenv('EMAIL_ADDRESS')
-    sender_password = os.getenv('EMAIL_PASSWORD')  # 앱 비밀번호 사용
-    
-    print(sender_email, sender_password)
-    
+# 일괄 평가용: 레코드 하나를 불러와 평가하고 결과를 저장하는 함수 (작업 스레드에서 실행)
+def evaluate_record(record_id):
+    record = fetch_record_by_id(record_id)
+    if not record:
+        raise LookupError(error_message)
+    chat, email, name = record
+    with use_ledger(evaluation_ledger(record_id)):
+        evaluation = get_evaluation(chat)
+    save_record_evaluation(record_id, evaluation)
+    return evaluation
+
+# 여러 레코드를 동시에 평가하고 진행 상황을 표로 보여주는 함수
+def run_bulk_evaluation(records, max_workers, send_emails):
+    rows = {record[0]: {"name": record[1], "email": record[2], "status": status_pending} for record in records}
+    progress_bar = st.progress(0)
+    table_placeholder = st.empty()
+    table_placeholder.dataframe(list(rows.values()), use_container_width=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(evaluate_record, record_id): record_id for record_id in rows}
+        for done, future in enumerate(as_completed(futures), 1):
+            record_id = futures[future]
+            row = rows[record_id]
+            try:
+                evaluation = future.result()
+                row["status"] = status_evaluated
+                # 이메일은 대기열에 넣고 백그라운드에서 전송
+                if send_emails:
+                    outbox_id = send_email(row["email"], row["name"], evaluation_email_subject, evaluation, record_id)
+                    st.session_state.outbox_ids.append(outbox_id)
+                    row["status"] = status_queued
+            except Exception as e:
+                record_span("bulk_evaluation", 0, f"{type(e).__name__}: {e}", record_id=record_id)
+                row["status"] = f"{status_failed}: {e}"
+
+            progress_bar.progress(done / len(rows))
+            table_placeholder.dataframe(list(rows.values()), use_container_width=True)
+
+# 이메일로 평가 결과 전송 함수 (발송 대기열에 넣고 outbox id 반환, 실제 전송은 백그라운드에서 처리)
+@traced("send_email")
+def send_email(recipient_email, name, subject, body, record_id=None):
     # 마크다운을 HTML로 변환
     html_body = markdown.markdown(body)
     
-    message = MIMEMultipart("alternative")
-    message['From'] = sender_email
-    message['To'] = recipient_email
-    message['Subject'] = subject
-    
-    # HTML 메시지 추가
-    message.attach(MIMEText(html_body, 'html'))
-    
-    try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)  # 앱 비밀번호로 로그인
-            server.send_message(message)
-            server.quit()
-        return True
-    except Exception as e:
-        st.error(f"이메일을 보내는 동안 오류가 발생했습니다: {str(e)}")
-        print("Error occurred while sending an email.")
-        return False
+    return enqueue_email(recipient_email, subject, html_body, record_id)
+
+# 전송 대기열에 넣은 메일의 상태를 주기적으로 확인해 보여주는 부분
+@st.fragment(run_every=2)
+def show_outbox_status():
+    rows = fetch_outbox_status(st.session_state.outbox_ids)
+    if rows:
+        st.write(f"### {outbox_section_title}")
+        st.dataframe(
+            [
+                {"email": recipient, "status": status, "attempts": attempts, "error": last_error, "sent_at": sent_at}
+                for _, recipient, status, attempts, last_error, sent_at in rows
+            ],
+            use_container_width=True,
+        )
+
+# 측정 로그 파일 끝부분을 읽어 연산별로 요약하는 함수 (여러 관리자 화면이 열려 있어도 5초에 한 번만 읽음)
+@st.cache_data(ttl=METRICS_REFRESH_INTERVAL, show_spinner=False)
+def load_metrics_summary(minutes):
+    return summarize(load_spans(since=datetime.now() - timedelta(minutes=minutes)))
+
+# 모든 앱이 남긴 측정 기록으로 연산별 p50/p95 지연 시간과 토큰 수를 주기적으로 보여주는 부분
+@st.fragment(run_every=METRICS_REFRESH_INTERVAL)
+def show_metrics():
+    minutes = st.number_input(metrics_window_label, min_value=1, max_value=24 * 60, value=15)
+    rows = load_metrics_summary(minutes)
+    if rows:
+        st.dataframe(rows, use_container_width=True)
+    else:
+        st.info(metrics_empty_message)
 
 # Streamlit 애플리케이션
 st.title(title)
@@ -166,8 +654,40 @@ password = st.text_input(password_label, type="password")
 
 if password == os.getenv('PASSWORD'):  # 환경 변수에 저장된 비밀번호와 비교
     # 세션 상태 초기화
-    if 'records' not in st.session_state:
-        st.session_state.records = fetch_records()
+    if 'outbox_ids' not in st.session_state:
+        st.session_state.outbox_ids = []
+
+    # 검색과 페이지 조회에 쓰는 인덱스가 있도록 스키마를 최신 버전으로 맞춤 (학생 앱은 버전만 확인)
+    try:
+        ensure_schema()
+    except mysql.connector.Error as error:
+        st.error(f"{schema_error_message} {error}")
+        st.stop()
+
+    # 이전에 보내지 못한 메일도 이어서 보내도록 발송 스레드 시작
+    get_outbox_sender()
+
+    # 지난 학기 기록을 주기적으로 보관 테이블로 옮기는 스레드 시작
+    get_archiver()
+
+    # 검색 조건 (이름/이메일, 날짜 범위): 조건이 바뀌면 첫 페이지부터 다시 불러옴
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        search = st.text_input(search_label)
+    with col2:
+        date_range = st.date_input(date_range_label, value=())
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+
+    record_filter = (search.strip(), date_from, date_to)
+    if st.session_state.get('record_filter') != record_filter:
+        st.session_state.record_filter = record_filter
+        st.session_state.page_cursors = [None]
+        # 새 기록 알림과 새로고침은 이 id 이후의 기록만 같은 검색 조건으로 확인
+        st.session_state.max_record_id = fetch_max_record_id(*record_filter)
+        load_records_page()
+
+    show_new_records_notice()
 
     # 콤보박스와 새로고침 버튼을 같은 줄에 배치
     st.write(select_record_label)  # 레이블은 별도로 작성
@@ -175,51 +695,113 @@ if password == os.getenv('PASSWORD'):  # 환경 변수에 저장된 비밀번호
 
     with col1:
         with st.container():
-            # 레코드 선택
-            record_options = [f"{record[1]} ({record[2]}) - {record[3]}" for record in st.session_state.records]
-            selected_record = st.selectbox("", record_options, label_visibility="collapsed")  # 레이블을 빈 문자열로 설정하여 표시되지 않게 함
+            # 레코드 선택 (선택값이 바로 레코드 ID)
+            records_by_id = {record[0]: record for record in st.session_state.records}
+            selected_record_id = st.selectbox(
+                "",
+                list(records_by_id),
+                format_func=lambda record_id: record_label(records_by_id[record_id]),
+                label_visibility="collapsed",  # 레이블을 빈 문자열로 설정하여 표시되지 않게 함
+            )
     
     with col2:
         with st.container():
             # 새로고침 버튼
             if st.button(refresh_button_label):
-                st.session_state.records = fetch_records()
+                refresh_records()
                 st.rerun()  # 페이지 리로드
 
-    # 선택된 레코드 ID 추출
-    selected_record_id = st.session_state.records[record_options.index(selected_record)][0]
+    # 이전/다음 페이지 (마지막 레코드의 (time, id)를 기준으로 다음 페이지를 불러옴)
+    col1, col2 = st.columns(2)
+    with col1:
+        if len(st.session_state.page_cursors) > 1 and st.button(previous_page_label):
+            st.session_state.page_cursors.pop()
+            load_records_page()
+            st.rerun()
+    with col2:
+        if st.session_state.has_next_page and st.button(next_page_label):
+            last_record = st.session_state.records[-1]
+            st.session_state.page_cursors.append((last_record[3], last_record[0]))
+            load_records_page()
+            st.rerun()
 
-    # 선택된 학생의 대화 기록 불러오기
+    # 선택된 학생의 대화 기록 불러오기 (캐시 사용, 앞뒤 기록은 미리 불러옴)
     record = fetch_record_by_id(selected_record_id)
+    prefetch_neighbour_records(st.session_state.records, selected_record_id)
+    cache_stats = get_transcript_cache().stats()
+    st.caption(f"{transcript_cache_label}: hits {cache_stats['hits']} / misses {cache_stats['misses']} / size {cache_stats['size']}")
     if record:
         chat, email, name = record
-        chat = json.loads(chat)
         st.write(f"### {evaluation_section_title}")
-        for message in chat:
-            timestamp = message.get("timestamp", "")
-            if message["role"] == "user":
-                st.write(f"**You** ({timestamp}): {message['content']}")
-            elif message["role"] == "assistant":
-                st.write(f"**AI** ({timestamp}): {message['content']}")
-
-    # 평가 버튼
-    if st.button(evaluate_button_label):
+        transcript_area = st.container()  # 대화 기록은 버튼 처리가 끝난 뒤 이 자리에 그림
+
+    # 평가 버튼 (이미 평가된 기록은 캐시에서 불러오고, 다시 평가하기는 캐시를 무시)
+    col1, col2 = st.columns(2)
+    with col1:
+        evaluate_click = st.button(evaluate_button_label)
+    with col2:
+        reevaluate_click = st.button(reevaluate_button_label)
+
+    if evaluate_click or reevaluate_click:
         if record:
-            evaluation = get_evaluation(record[0])
+            with use_ledger(evaluation_ledger(selected_record_id)):
+                evaluation = get_evaluation(record[0], reevaluate=reevaluate_click)
+            save_record_evaluation(selected_record_id, evaluation)
             st.session_state['evaluation'] = evaluation  # 세션 상태에 평가 결과 저장
             st.write(evaluation_result_title)
             st.write(evaluation)
-            
-            print(name)
-            print(email)
-            print(evaluation)
         else:
             st.error(error_message)
 
     # 전송하기 버튼
     if 'evaluation' in st.session_state and st.button(send_button_label):
         evaluation = st.session_state['evaluation']
-        if send_email(email, name, evaluation_email_subject, evaluation):
-            st.success(f"{success_message} {email}.")
+        outbox_id = send_email(email, name, evaluation_email_subject, evaluation, selected_record_id)
+        st.session_state.outbox_ids.append(outbox_id)
+        st.info(f"{queued_message} {email}.")
+
+    # 평가/전송 버튼이 대화 기록 렌더링을 기다리지 않도록 마지막에 그림
+    if record:
+        with transcript_area:
+            transcript_viewer(selected_record_id, record[0])
+
+    show_outbox_status()
+
+    # 일괄 평가: 여러 기록을 동시에 평가하고 필요하면 이메일까지 전송
+    with st.expander(bulk_section_title):
+        records_by_label = {record_label(record): record for record in st.session_state.records}
+        select_unevaluated = st.checkbox(bulk_unevaluated_label)
+        if select_unevaluated:
+            # 현재 페이지에 없는 기록도 포함
+            unevaluated_records = fetch_unevaluated_records()
+            records_by_label.update({record_label(record): record for record in unevaluated_records})
+            default_labels = [record_label(record) for record in unevaluated_records]
+        else:
+            default_labels = []
+        bulk_labels = st.multiselect(bulk_select_label, list(records_by_label), default=default_labels)
+        bulk_workers = st.number_input(bulk_workers_label, min_value=1, max_value=EVAL_WORKER_LIMIT, value=EVAL_MAX_WORKERS)
+        bulk_send = st.checkbox(bulk_send_label)
+
+        if st.button(bulk_run_label):
+            if bulk_labels:
+                run_bulk_evaluation([records_by_label[label] for label in bulk_labels], int(bulk_workers), bulk_send)
+                st.success(bulk_done_message)
+            else:
+                st.warning(bulk_empty_message)
+
+    # 응시자별, 현재 검색 조건(기수)별, 일별 토큰 사용량과 비용 (집계 쿼리는 사용량 보기를 선택했을 때만 실행)
+    with st.expander(usage_section_title):
+        if st.checkbox(usage_show_label):
+            st.write(f"**{usage_cohort_label}**: " + usage_cohort_template.format(**fetch_cohort_usage(*st.session_state.record_filter)))
+            st.write(f"**{usage_candidates_label}**")
+            candidate_usage = fetch_candidate_usage([record[0] for record in st.session_state.records], st.session_state.record_filter[1])
+            st.dataframe(candidate_usage, use_container_width=True)
+            st.write(f"**{usage_daily_label}**")
+            st.dataframe(fetch_daily_usage(), use_container_width=True)
+
+    # 관리자용 성능 측정 화면 (측정 기록 보기를 선택했을 때만 로그 파일을 주기적으로 읽음)
+    with st.expander(metrics_section_title):
+        if st.checkbox(metrics_show_label):
+            show_metrics()
 else:
     st.error(wrong_password_message)
@@ -0,0 +1,172 @@
+import os
+import uuid
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import streamlit as st
+from db import execute
+from metrics import add_span_listener, current_session_id
+
+# 모델별 100만 토큰당 가격 (USD, 입력/출력), 모델 이름이 이 이름으로 시작하면 같은 가격 사용
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# 현재 LLM 호출의 사용량을 기록할 장부 (스크립트 실행 스레드나 평가 작업 스레드별로 설정)
+_current_ledger = ContextVar("usage_ledger", default=None)
+
+
+# 토큰 사용량 장부 테이블 생성 함수 (프로세스당 한 번만 실행)
+@st.cache_resource
+def create_usage_table():
+    execute("""
+    CREATE TABLE IF NOT EXISTS llm_usage (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        app VARCHAR(32) NOT NULL,
+        session_key VARCHAR(64) NOT NULL,
+        record_table VARCHAR(32) NULL,
+        record_id INT NULL,
+        model VARCHAR(64) NOT NULL,
+        prompt_tokens INT NOT NULL,
+        completion_tokens INT NOT NULL,
+        cost_usd DECIMAL(10, 6) NOT NULL,
+        created_at DATETIME NOT NULL,
+        INDEX idx_llm_usage_session (session_key),
+        INDEX idx_llm_usage_record (record_table, record_id),
+        INDEX idx_llm_usage_created (created_at)
+    )
+    """)
+
+
+# 장부 기록을 백그라운드에서 처리하는 프로세스 공용 스레드 풀
+@st.cache_resource
+def get_usage_writer():
+    return ThreadPoolExecutor(max_workers=int(os.getenv("USAGE_WRITER_THREADS", "1")), thread_name_prefix="usage-writer")
+
+
+def usage_cost(model, prompt_tokens, completion_tokens):
+    for prefix, (input_price, output_price) in MODEL_PRICES.items():
+        if (model or "").startswith(prefix):
+            return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return 0.0
+
+
+def _insert_usage(app, session_key, record_table, record_id, model, prompt_tokens, completion_tokens, cost, created_at):
+    create_usage_table()
+    sql = """
+    INSERT INTO llm_usage (app, session_key, record_table, record_id, model, prompt_tokens, completion_tokens, cost_usd, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    execute(sql, (app, session_key, record_table, record_id, model, prompt_tokens, completion_tokens, cost, created_at))
+
+
+def _log_write_error(future):
+    if future.exception() is not None:
+        print(f"Error while saving token usage: {future.exception()}")
+
+
+# 면담/검사 세션 하나(또는 평가 대상 레코드 하나)의 토큰 사용량 장부
+# 호출마다 llm_usage 에 한 줄씩 기록하고, 결과 행에 저장할 합계를 함께 유지
+class UsageLedger:
+    def __init__(self, app, session_key=None, record_table=None, record_id=None):
+        self.app = app
+        self.session_key = session_key or uuid.uuid4().hex
+        self.record_table = record_table
+        self.record_id = record_id
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, model, prompt_tokens, completion_tokens):
+        cost = usage_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            future = get_usage_writer().submit(
+                _insert_usage, self.app, self.session_key, self.record_table, self.record_id,
+                model, prompt_tokens, completion_tokens, cost, datetime.now(),
+            )
+            self._pending = [f for f in self._pending if not f.done()] + [future]
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost_usd += cost
+        future.add_done_callback(_log_write_error)
+
+    # 결과 행을 저장한 뒤 이 세션의 llm_usage 기록을 그 행과 연결하는 함수
+    # (이후 호출도 같은 행으로 기록하고, 이미 기록된 줄은 저장이 끝나기를 기다렸다가 갱신)
+    def link_record(self, record_table, record_id):
+        with self._lock:
+            self.record_table = record_table
+            self.record_id = record_id
+            pending = list(self._pending)
+        wait(pending)
+        create_usage_table()
+        execute(
+            "UPDATE llm_usage SET record_table = %s, record_id = %s WHERE session_key = %s",
+            (record_table, record_id, self.session_key),
+        )
+
+    # 결과 행에 함께 저장할 (prompt_tokens, completion_tokens, cost_usd)
+    def totals(self):
+        with self._lock:
+            return self.prompt_tokens, self.completion_tokens, round(self.cost_usd, 6)
+
+
+# 현재 LLM 호출을 기록할 장부
+# fragment 재실행은 새 스크립트 스레드에서 실행되어 ContextVar 가 비어 있으므로 세션의 장부를 사용
+def _active_ledger():
+    ledger = _current_ledger.get()
+    if ledger is None and current_session_id() is not None:
+        ledger = st.session_state.get("usage_ledger")
+    return ledger
+
+
+# llm.chat 측정이 기록되면 현재 장부에 토큰 수를 더하는 함수
+def _record_llm_usage(span):
+    if span["operation"] != "llm.chat" or span.get("prompt_tokens") is None:
+        return
+    ledger = _active_ledger()
+    if ledger is None:
+        return
+    ledger.add(span.get("model"), span["prompt_tokens"], span["completion_tokens"])
+
+
+add_span_listener(_record_llm_usage)
+
+
+# with 블록 안의 LLM 호출을 ledger 에 기록
+@contextmanager
+def use_ledger(ledger):
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+
+# 작업 스레드에서 실행할 함수가 호출한 쪽의 장부를 그대로 쓰도록 감싸는 함수
+def bind_ledger(fn):
+    ledger = _current_ledger.get()
+
+    def run(*args, **kwargs):
+        with use_ledger(ledger):
+            return fn(*args, **kwargs)
+    return run
+
+
+# 현재 Streamlit 세션의 장부를 불러오고(없으면 새로 만들고) 이번 실행의 LLM 호출을 기록하도록 설정
+def session_ledger(app):
+    if "usage_ledger" not in st.session_state:
+        st.session_state["usage_ledger"] = UsageLedger(app)
+    ledger = st.session_state["usage_ledger"]
+    _current_ledger.set(ledger)
+    return ledger
+
+
+# 결과를 저장한 뒤 다음 검사를 위해 장부를 새로 시작하는 함수
+def end_session_ledger():
+    st.session_state.pop("usage_ledger", None)
+    _current_ledger.set(None)
@@ -0,0 +1,54 @@
+import os
+import time
+import httpx
+import streamlit as st
+from openai import OpenAI
+from cassette import wrap_client
+from metrics import instrument_client
+
+# 서버 프로세스 전체에서 공유하는 OpenAI 클라이언트 (재실행 시에도 연결 유지)
+# 연결 풀 크기와 타임아웃은 .env 에서 변경 가능 (openai 버전에 따라 달라지는 DefaultHttpxClient 대신 httpx.Client 를 직접 생성)
+# LLM_CASSETTE_MODE 가 record/replay 이면 요청과 응답을 디스크에 기록/재생
+# 모든 chat.completions 호출의 지연 시간과 토큰 수를 metrics 로 기록
+@st.cache_resource
+def get_openai_client():
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "50")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120")),
+        ),
+        timeout=httpx.Timeout(
+            float(os.getenv("OPENAI_READ_TIMEOUT", "120")),
+            connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+        ),
+        follow_redirects=True,
+    )
+    return instrument_client(wrap_client(OpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client)))
+
+
+# 스트리밍으로 응답을 받아 placeholder에 토큰 단위로 출력하는 함수
+def stream_chat_completion(client, placeholder, prefix="", **kwargs):
+    start_time = time.perf_counter()
+    first_token_time = None
+    answer = ""
+
+    stream = client.chat.completions.create(stream=True, **kwargs)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if first_token_time is None:
+            first_token_time = time.perf_counter() - start_time
+        answer += delta
+        placeholder.markdown(f"{prefix}{answer}▌")
+
+    placeholder.markdown(f"{prefix}{answer}")
+
+    timing = {
+        "time_to_first_token": first_token_time,
+        "generation_time": time.perf_counter() - start_time,
+    }
+    return answer, timing
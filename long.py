@@ -1,21 +1,61 @@
 from dotenv import load_dotenv
+import mysql.connector
 from datetime import datetime
-from openai import OpenAI
 import streamlit as st
-import mysql.connector
+import streamlit.components.v1 as components
 import time
 import os
 import json
+import uuid
+import threading
+from db import execute
+from ledger import end_session_ledger, session_ledger
+from llm import get_openai_client
+from metrics import traced
+from schema import require_schema
+from scoring import estimate_score, pre_score_answer, reference_answers
 
 load_dotenv()  # .env 파일 로드
 
-# Database connection parameters
-DB_HOST = os.getenv("DB_HOST")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_DATABASE = os.getenv("DB_DATABASE")
+client = get_openai_client()
+
+# 이 검사의 토큰 사용량 장부 (이번 실행의 모든 LLM 호출을 기록)
+usage_ledger = session_ledger("long")
+
+# 학습/지연 시간 (.env 의 LONG_LEARNING_DURATION, LONG_DELAY_DURATION 초로 변경 가능, 부하 측정용)
+LEARNING_DURATION = float(os.getenv("LONG_LEARNING_DURATION", 3 * 60))  # 학습 시간: 총 3분
+DELAY_DURATION = float(os.getenv("LONG_DELAY_DURATION", 20 * 60))  # 지연 시간: 총 20분
+PHASE_CHECK_INTERVAL = 5  # 단계 종료 여부를 서버에서 확인하는 간격 (초)
+
+# 학습 시작 시각 보관소 (URL 에는 추측할 수 없는 토큰만 두고 시작 시각과 응시자 정보는 서버 프로세스에 보관)
+# 시작 시각을 URL 에 그대로 두면 응시자가 값을 바꿔 학습/지연 단계를 건너뛸 수 있음
+class LearningStarts:
+    def __init__(self):
+        self._starts = {}
+        self._lock = threading.Lock()
+
+    # 토큰 -> (시작 시각, 이름, 이메일)
+    def add(self, start_time, name, email):
+        token = uuid.uuid4().hex
+        with self._lock:
+            # 검사가 끝났을 시간이 한참 지난 토큰은 정리
+            expired = start_time - 24 * 60 * 60
+            self._starts = {key: value for key, value in self._starts.items() if value[0] >= expired}
+            self._starts[token] = (start_time, name, email)
+        return token
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    def get(self, token):
+        with self._lock:
+            return self._starts.get(token)
+
+    def discard(self, token):
+        with self._lock:
+            self._starts.pop(token, None)
+
+
+@st.cache_resource
+def get_learning_starts():
+    return LearningStarts()
 
 # Initialize session state variables
 if 'user_info_submitted' not in st.session_state:
@@ -45,6 +85,14 @@ if 'recall_start_time' not in st.session_state:
 if 'quiz_start_time' not in st.session_state:
     st.session_state.quiz_start_time = None
 
+# 새로고침으로 세션이 새로 시작되어도 검사가 이어지도록 URL의 토큰으로 서버에 보관된 시작 시각과 응시자 정보를 복원
+if st.session_state.learning_start_time is None and 'learning_token' in st.query_params:
+    restored = get_learning_starts().get(st.query_params['learning_token'])
+    if restored is not None:
+        st.session_state.learning_start_time, st.session_state.user_name, st.session_state.user_email = restored
+        st.session_state.user_info_submitted = True
+        st.session_state.learning_phase = True
+
 # ChatGPT API tools setup
 tools = [
     {
@@ -80,14 +128,30 @@ questions = [
     "강화 학습의 예시로 무엇을 들 수 있나요?"
 ]
 
+# 채점할 문항만 남긴 evaluate_answers 도구 스키마
+def evaluation_tools(indexes):
+    function = tools[0]["function"]
+    names = [f"a{i + 1}" for i in indexes]
+    parameters = dict(
+        function["parameters"],
+        properties={name: function["parameters"]["properties"][name] for name in names},
+        required=names,
+    )
+    return [{"type": "function", "function": dict(function, parameters=parameters)}]
+
 # Function to evaluate answers using ChatGPT API
-def evaluate_answers_with_chatgpt(text_to_remember, questions, user_answers):
+# indexes 의 문항만 보내고 그 점수 리스트를 반환 (오류는 evaluate_answers_with_chatgpt 측정에 기록되고 그대로 전달)
+@traced("evaluate_answers_with_chatgpt")
+def evaluate_answers_with_chatgpt(text_to_remember, questions, user_answers, indexes=None):
+    if indexes is None:
+        indexes = list(range(len(questions)))
+
     query = f"다음은 지연 회상 검사를 위한 텍스트야: {text_to_remember}\n"
     query += "위의 텍스트에 대한 질문과 응답은 다음과 같아.\n"
 
-    for i, (question, answer) in enumerate(zip(questions, user_answers), 1):
-        query += f"질문 {i}: {question}\n"
-        query += f"응답 {i}: {answer}\n"
+    for i in indexes:
+        query += f"질문 {i + 1}: {questions[i]}\n"
+        query += f"응답 {i + 1}: {user_answers[i]}\n"
 
     query += "각 응답에 대해 맞으면 1, 부분적으로 맞으면 0.5, 틀리면 0으로 평가해 줘."
 
@@ -96,54 +160,90 @@ def evaluate_answers_with_chatgpt(text_to_remember, questions, user_answers):
         {"role": "user", "content": query}
     ]
 
-    try:
-        resp = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            tools=tools,
-        )
-        
-        result = json.loads(resp.choices[0].message.tool_calls[0].function.arguments)
-        scores = [result[f'a{i}'] for i in range(1, 8)]
-        
-        # Print for debugging
-        print("API Response:", result)
-        print("Extracted Scores:", scores)
-        
-        return scores
-    except Exception as e:
-        print(f"Error in API call: {e}")
-        return [0] * 7  # Return all zeros in case of error
+    resp = client.chat.completions.create(
+        model="gpt-4o",
+        messages=messages,
+        tools=evaluation_tools(indexes),
+        tool_choice={"type": "function", "function": {"name": "evaluate_answers"}},
+    )
+
+    result = json.loads(resp.choices[0].message.tool_calls[0].function.arguments)
+    return [result[f'a{i + 1}'] for i in indexes]
+
+# 답안 채점 함수: 빈 답, 확실한 정답/오답은 바로 채점하고 나머지 문항만 채점 모델에 보냄
+# 채점 모델 호출이 실패하면 애매한 문항은 핵심어 수로 추정한 점수를 사용하고 화면에 알림
+def evaluate_answers(text_to_remember, questions, user_answers):
+    scores = [pre_score_answer(answer, reference) for answer, reference in zip(user_answers, reference_answers)]
+    uncertain = [i for i, score in enumerate(scores) if score is None]
+
+    if uncertain:
+        try:
+            llm_scores = evaluate_answers_with_chatgpt(text_to_remember, questions, user_answers, uncertain)
+        except Exception as e:
+            st.warning(f"채점 모델을 사용할 수 없어 일부 문항은 핵심어로 추정한 점수를 사용합니다: {e}")
+            llm_scores = [estimate_score(user_answers[i], reference_answers[i]) for i in uncertain]
+        for i, score in zip(uncertain, llm_scores):
+            scores[i] = score
+    return scores
 
 # None 값을 처리하여 SQL에 저장할 수 있도록 하는 함수
 def convert_none_to_null(data):
     return [None if x is None else x for x in data]
 
-# MySQL에 데이터 저장 함수
+# MySQL에 데이터 저장 함수 (저장 여부와 오류 메시지를 반환)
 def save_results_to_db(data):
     # None 값을 NULL로 변환
     data = convert_none_to_null(data)
-    print("Data to save in DB:", data)  # 디버깅용 출력
-
-    connection = mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_DATABASE
-    )
-    cursor = connection.cursor()
 
     try:
+        require_schema()
         sql = """
         INSERT INTO long_tab (date, name, email, correct_answers, time_taken, answer1, answer2, answer3, answer4, answer5, answer6, answer7,
-        correct1, correct2, correct3, correct4, correct5, correct6, correct7)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+        correct1, correct2, correct3, correct4, correct5, correct6, correct7, prompt_tokens, completion_tokens, cost_usd)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
         """
-        cursor.execute(sql, data)
-        connection.commit()
-    finally:
-        cursor.close()
-        connection.close()
+        record_id = execute(sql, [*data, *usage_ledger.totals()])
+    except (mysql.connector.Error, RuntimeError) as error:  # RuntimeError: 스키마가 최신 버전이 아님
+        return False, f"결과를 저장하지 못했습니다. 감독자에게 알려 주세요: {error}"
+    usage_ledger.link_record("long_tab", record_id)  # llm_usage 기록을 저장한 검사 결과와 연결
+    return True, None
+
+# 저장된 시작 시각을 기준으로 끝난 단계를 다음 단계로 넘기는 함수
+def advance_phases():
+    now = time.time()
+    if st.session_state.learning_phase and now >= st.session_state.learning_start_time + LEARNING_DURATION:
+        st.session_state.learning_phase = False
+        st.session_state.recall_phase = True
+        st.session_state.recall_start_time = st.session_state.learning_start_time + LEARNING_DURATION
+    if st.session_state.recall_phase and now >= st.session_state.recall_start_time + DELAY_DURATION:
+        st.session_state.recall_phase = False
+        st.session_state.quiz_phase = True
+
+# 브라우저에서 남은 시간을 표시하는 카운트다운 (서버 스레드를 붙잡지 않음)
+def show_countdown(label, start_time, duration):
+    remaining = max(start_time + duration - time.time(), 0)
+    components.html(f"""
+    <div style="font-family: sans-serif;">
+      <progress id="bar" max="{duration}" value="{duration - remaining}" style="width: 100%;"></progress>
+      <div id="text"></div>
+    </div>
+    <script>
+      const end = performance.now() + {remaining * 1000};
+      function tick() {{
+        const left = Math.max(end - performance.now(), 0) / 1000;
+        document.getElementById("bar").value = {duration} - left;
+        document.getElementById("text").textContent = "{label}: " + Math.ceil(left) + " 초";
+        if (left > 0) requestAnimationFrame(tick);
+      }}
+      tick();
+    </script>
+    """, height=60)
+
+# 일정 간격으로 이 부분만 다시 실행해 단계가 끝났는지 확인하고, 끝났으면 전체 페이지를 다시 실행
+@st.fragment(run_every=PHASE_CHECK_INTERVAL)
+def watch_phase_deadline(start_time, duration):
+    if time.time() >= start_time + duration:
+        st.rerun()
 
 # Streamlit 페이지 기본 설정
 st.title("Long-Term Memory Test with Timer")
@@ -169,7 +269,7 @@ if not st.session_state.user_info_submitted:
         st.session_state.user_info_submitted = True
         st.session_state.user_name = name
         st.session_state.user_email = email
-        st.experimental_rerun()
+        st.rerun()
 else:
     st.header(f"환영합니다, {st.session_state.user_name}님!")
     st.write("이 테스트는 장기 기억을 평가하기 위한 지연 회상 과제입니다.")
@@ -179,59 +279,25 @@ else:
     if st.button("테스트 시작") and not st.session_state.learning_phase:
         st.session_state.learning_phase = True
         st.session_state.learning_start_time = time.time()
-        st.experimental_rerun()
+        st.query_params['learning_token'] = get_learning_starts().add(
+            st.session_state.learning_start_time, st.session_state.user_name, st.session_state.user_email
+        )
+        st.rerun()
+
+    advance_phases()
 
     # 학습 단계
     if st.session_state.learning_phase:
         st.write("다음 텍스트를 기억하세요:")
         st.write(text_to_remember)
 
-        learning_duration = 3 * 60 # 총 3분
-        start_time = time.time()
-
-        progress_bar = st.progress(0)
-        progress_placeholder = st.empty()
-
-        while True:
-            elapsed_time = time.time() - start_time
-            remaining_time = learning_duration - elapsed_time
-            
-            if remaining_time <= 0:
-                break
-
-            progress = min(elapsed_time / learning_duration, 1.0)
-            progress_bar.progress(progress)
-            progress_placeholder.text(f"남은 학습 시간: {int(remaining_time) + 1} 초")
-            time.sleep(0.1)
-
-        st.session_state.learning_phase = False
-        st.session_state.recall_phase = True
-        st.session_state.recall_start_time = time.time()
-        st.experimental_rerun()
+        show_countdown("남은 학습 시간", st.session_state.learning_start_time, LEARNING_DURATION)
+        watch_phase_deadline(st.session_state.learning_start_time, LEARNING_DURATION)
 
     # 지연 회상 단계
     if st.session_state.recall_phase:
-        delay_duration = 20 * 60 # 총 20분
-        start_time = time.time()
-
-        progress_bar = st.progress(0)
-        progress_placeholder = st.empty()
-
-        while True:
-            elapsed_time = time.time() - start_time
-            remaining_time = delay_duration - elapsed_time
-            
-            if remaining_time <= 0:
-                break
-
-            progress = min(elapsed_time / delay_duration, 1.0)
-            progress_bar.progress(progress)
-            progress_placeholder.text(f"지연 남은 시간: {int(remaining_time) + 1} 초")
-            time.sleep(0.1)
-
-        st.session_state.recall_phase = False
-        st.session_state.quiz_phase = True
-        st.experimental_rerun()
+        show_countdown("지연 남은 시간", st.session_state.recall_start_time, DELAY_DURATION)
+        watch_phase_deadline(st.session_state.recall_start_time, DELAY_DURATION)
 
     # 문제 풀기 단계
     if st.session_state.quiz_phase and not st.session_state.quiz_started:
@@ -239,7 +305,7 @@ else:
             st.session_state.quiz_started = True
             st.session_state.quiz_start_time = time.time()
             st.session_state.quiz_results = []  # 테스트 시작 시 초기화
-            st.experimental_rerun()
+            st.rerun()
 
 if st.session_state.quiz_started and st.session_state.quiz_phase:
     st.write("아래 질문에 답하세요:")
@@ -254,8 +320,8 @@ if st.session_state.quiz_started and st.session_state.quiz_phase:
 
         # Show a loading message
         with st.spinner('답변을 평가하는 중입니다...'):
-            # ChatGPT API를 사용하여 답변 평가
-            answer_results = evaluate_answers_with_chatgpt(text_to_remember, questions, user_inputs)
+            # 바로 채점할 수 없는 답변만 ChatGPT API로 평가
+            answer_results = evaluate_answers(text_to_remember, questions, user_inputs)
 
         correct_answers = sum(1 for score in answer_results if score == 1)
         partial_answers = sum(1 for score in answer_results if score == 0.5)
@@ -279,13 +345,20 @@ if st.session_state.quiz_started and st.session_state.quiz_phase:
             *answer_results
         )
 
-        save_results_to_db(data_to_save)
-        st.success("결과가 성공적으로 저장되었습니다!")
-
-        # 결과 저장 및 초기화
-        st.session_state.learning_phase = False
-        st.session_state.recall_phase = False
-        st.session_state.test_phase = False
-        st.session_state.quiz_phase = False
-        st.session_state.quiz_started = False
+        saved, save_error = save_results_to_db(data_to_save)
+        if saved:
+            end_session_ledger()  # 다음 검사는 새 장부로 기록
+            st.success("결과가 성공적으로 저장되었습니다!")
+
+            # 결과 저장 및 초기화
+            st.session_state.learning_phase = False
+            st.session_state.recall_phase = False
+            st.session_state.test_phase = False
+            st.session_state.quiz_phase = False
+            st.session_state.quiz_started = False
+            if 'learning_token' in st.query_params:
+                get_learning_starts().discard(st.query_params['learning_token'])
+            st.query_params.clear()
+        else:
+            st.error(save_error)  # 답안은 화면에 남아 있으므로 다시 평가하기를 눌러 저장할 수 있음
 
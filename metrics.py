@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from types import SimpleNamespace
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+METRICS_WINDOW = 1000  # 연산별로 메모리에 보관하는 최근 측정 수
+METRICS_TAIL_BYTES = 2 * 1024 * 1024  # 관리 화면에서 읽는 로그 파일 끝부분 크기
+
+_lock = threading.Lock()
+_recent = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))
+_listeners = []
+
+
+# 측정 로그 파일 경로 (.env 의 METRICS_LOG, 빈 값이면 파일에 기록하지 않음)
+def metrics_log_path():
+    return os.getenv("METRICS_LOG", "metrics.jsonl")
+
+
+# 현재 Streamlit 세션 id (스크립트 실행 스레드가 아니면 None)
+def current_session_id():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+# 측정이 기록될 때마다 호출할 함수 등록 (예: 토큰 사용량 장부)
+def add_span_listener(listener):
+    _listeners.append(listener)
+
+
+# 측정 하나를 메모리와 로그 파일(JSON Lines)에 기록하는 함수
+def record_span(operation, duration, error=None, session_id=None, **fields):
+    entry = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "operation": operation,
+        "duration_ms": round(duration * 1000, 2),
+        "error": error,
+        "session_id": session_id or current_session_id(),
+        **fields,
+    }
+    path = metrics_log_path()
+    with _lock:
+        _recent[operation].append(entry)
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+    for listener in _listeners:
+        try:
+            listener(entry)
+        except Exception as e:
+            print(f"Error in span listener: {e}")
+    return entry
+
+
+# with 블록의 실행 시간을 기록 (블록 안에서 fields 에 토큰 수 등을 추가할 수 있음)
+@contextmanager
+def span(operation, **fields):
+    start = time.perf_counter()
+    error = None
+    try:
+        yield fields
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record_span(operation, time.perf_counter() - start, error, **fields)
+
+
+# 함수 호출마다 실행 시간을 기록하는 데코레이터
+def traced(operation):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(operation):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def usage_fields(usage):
+    if usage is None:
+        return {}
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+
+# client.chat.completions.create 의 지연 시간과 토큰 수를 기록하는 객체
+# 스트리밍 응답은 마지막 조각의 usage 를 받을 수 있도록 include_usage 를 요청하고, 스트림이 끝날 때 기록
+class InstrumentedCompletions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, **kwargs):
+        fields = {"model": kwargs.get("model"), "stream": bool(kwargs.get("stream"))}
+        if not kwargs.get("stream"):
+            with span("llm.chat", **fields) as fields:
+                response = self._completions.create(**kwargs)
+                fields.update(usage_fields(response.usage))
+            return response
+        kwargs["stream_options"] = {**(kwargs.get("stream_options") or {}), "include_usage": True}
+        return self._instrument_stream(kwargs, fields, current_session_id())
+
+    def _instrument_stream(self, kwargs, fields, session_id):
+        start = time.perf_counter()
+        error = None
+        try:
+            for chunk in self._completions.create(**kwargs):
+                if "time_to_first_token_ms" not in fields and chunk.choices:
+                    fields["time_to_first_token_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                fields.update(usage_fields(chunk.usage))
+                yield chunk
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record_span("llm.chat", time.perf_counter() - start, error, session_id, **fields)
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+# OpenAI 클라이언트를 감싸 chat.completions 호출을 측정하고 나머지는 그대로 전달
+class InstrumentedClient:
+    def __init__(self, client):
+        self._client = client
+        self.chat = SimpleNamespace(completions=InstrumentedCompletions(client.chat.completions))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_client(client):
+    return InstrumentedClient(client)
+
+
+# 백분위수 계산 함수 (nearest-rank)
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+# 로그 파일의 끝부분에서 since 이후의 측정을 불러오는 함수 (모든 앱 프로세스의 측정 포함)
+def load_spans(since=None, path=None):
+    path = path or metrics_log_path()
+    if not path:
+        with _lock:
+            return [item for items in _recent.values() for item in items]
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - METRICS_TAIL_BYTES, 0))
+        lines = f.read().decode("utf-8", errors="ignore").splitlines()
+    if size > METRICS_TAIL_BYTES:
+        lines = lines[1:]  # 중간에서 잘린 첫 줄 제외
+
+    since = since.isoformat(timespec="milliseconds") if since else None
+    spans = []
+    for line in lines:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if since is None or item["time"] >= since:
+            spans.append(item)
+    return spans
+
+
+# 연산별 호출 수, 오류 수, p50/p95 지연 시간, 평균 토큰 수를 계산하는 함수
+def summarize(spans):
+    by_operation = defaultdict(list)
+    for item in spans:
+        by_operation[item["operation"]].append(item)
+    rows = []
+    for operation, items in sorted(by_operation.items()):
+        durations = [item["duration_ms"] for item in items]
+        row = {
+            "operation": operation,
+            "count": len(items),
+            "errors": sum(1 for item in items if item.get("error")),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+        }
+        for field in ("prompt_tokens", "completion_tokens"):
+            values = [item[field] for item in items if item.get(field) is not None]
+            row[f"avg_{field}"] = round(sum(values) / len(values), 1) if values else None
+        rows.append(row)
+    return rows
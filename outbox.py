@@ -0,0 +1,189 @@
+import os
+import uuid
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import streamlit as st
+from db import execute
+from metrics import span
+
+OUTBOX_BATCH_SIZE = 50  # SMTP 연결 하나로 보내는 최대 메일 수
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE = 30  # 재시도 대기 시간 (초, 시도할 때마다 두 배)
+OUTBOX_POLL_INTERVAL = 5  # 재시도할 메일이 있는지 확인하는 간격 (초)
+OUTBOX_STALE_CLAIM = 10 * 60  # 전송 중 상태로 이 시간 이상 남은 메일은 다시 대기 상태로
+
+
+# 이메일 발송 대기열 테이블 생성 함수 (프로세스당 한 번만 실행)
+@st.cache_resource
+def create_outbox_table():
+    execute("""
+    CREATE TABLE IF NOT EXISTS email_outbox (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        record_id INT NULL,
+        recipient VARCHAR(255) NOT NULL,
+        subject VARCHAR(255) NOT NULL,
+        html_body MEDIUMTEXT NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        next_attempt_at DATETIME NOT NULL,
+        claim_token CHAR(32) NULL,
+        claimed_at DATETIME NULL,
+        last_error TEXT NULL,
+        created_at DATETIME NOT NULL,
+        sent_at DATETIME NULL,
+        INDEX idx_email_outbox_due (status, next_attempt_at),
+        INDEX idx_email_outbox_record (record_id)
+    )
+    """)
+
+
+# SMTP 연결 함수 (.env 의 SMTP_HOST, SMTP_PORT, SMTP_STARTTLS 로 로컬 테스트 서버도 사용 가능)
+def open_smtp_connection():
+    server = smtplib.SMTP(os.getenv('SMTP_HOST', 'smtp.gmail.com'), int(os.getenv('SMTP_PORT', '587')), timeout=30)
+    if os.getenv('SMTP_STARTTLS', 'true').lower() == 'true':
+        server.starttls()
+    sender_password = os.getenv('EMAIL_PASSWORD')
+    if sender_password:
+        server.login(os.getenv('EMAIL_ADDRESS'), sender_password)  # 앱 비밀번호로 로그인
+    return server
+
+
+# 메일을 대기열에 넣고 outbox id를 반환하는 함수 (실제 전송은 백그라운드에서 처리)
+def enqueue_email(recipient, subject, html_body, record_id=None):
+    create_outbox_table()
+    now = datetime.now()
+    sql = """
+    INSERT INTO email_outbox (record_id, recipient, subject, html_body, next_attempt_at, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    outbox_id = execute(sql, (record_id, recipient, subject, html_body, now, now))
+    get_outbox_sender().wake()
+    return outbox_id
+
+
+# 대기열에 있는 메일들의 전송 상태를 불러오는 함수
+def fetch_outbox_status(outbox_ids):
+    if not outbox_ids:
+        return []
+    create_outbox_table()
+    placeholders = ", ".join(["%s"] * len(outbox_ids))
+    sql = f"""
+    SELECT id, recipient, status, attempts, last_error, sent_at
+    FROM email_outbox WHERE id IN ({placeholders}) ORDER BY id
+    """
+    return execute(sql, tuple(outbox_ids), fetch="all")
+
+
+# 백그라운드에서 대기열의 메일을 모아 보내는 스레드
+class OutboxSender:
+    def __init__(self):
+        self._wake_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake_event.set()
+
+    def _run(self):
+        create_outbox_table()
+        while True:
+            try:
+                self._release_stale_claims()
+                while self._send_batch():
+                    pass
+            except Exception as e:
+                print(f"Error in email outbox: {e}")
+            self._wake_event.wait(OUTBOX_POLL_INTERVAL)
+            self._wake_event.clear()
+
+    def _release_stale_claims(self):
+        sql = "UPDATE email_outbox SET status = 'pending', claim_token = NULL WHERE status = 'sending' AND claimed_at < %s"
+        execute(sql, (datetime.now() - timedelta(seconds=OUTBOX_STALE_CLAIM),))
+
+    # 보낼 시각이 된 메일을 한 묶음 가져와 SMTP 연결 하나로 전송 (보낸 메일이 있으면 True)
+    def _send_batch(self):
+        token = uuid.uuid4().hex
+        now = datetime.now()
+        sql = """
+        UPDATE email_outbox SET status = 'sending', claim_token = %s, claimed_at = %s
+        WHERE status = 'pending' AND next_attempt_at <= %s
+        ORDER BY id LIMIT %s
+        """
+        execute(sql, (token, now, now, OUTBOX_BATCH_SIZE))
+        rows = execute(
+            "SELECT id, recipient, subject, html_body, attempts FROM email_outbox WHERE claim_token = %s ORDER BY id",
+            (token,),
+            fetch="all",
+        )
+        if not rows:
+            return False
+
+        sender_email = os.getenv('EMAIL_ADDRESS')
+        server = None
+        try:
+            server = open_smtp_connection()
+        except Exception as e:
+            for row in rows:
+                self._mark_failed(row[0], row[4], e)
+            return False
+
+        try:
+            for position, (outbox_id, recipient, subject, html_body, attempts) in enumerate(rows):
+                message = MIMEMultipart("alternative")
+                message['From'] = sender_email
+                message['To'] = recipient
+                message['Subject'] = subject
+                message.attach(MIMEText(html_body, 'html'))
+                try:
+                    with span("smtp.send", outbox_id=outbox_id):
+                        server.send_message(message)
+                except smtplib.SMTPServerDisconnected as e:
+                    # 연결이 끊어지면 다시 연결하고 이 메일은 재시도 대상으로
+                    self._mark_failed(outbox_id, attempts, e)
+                    server = None
+                    try:
+                        server = open_smtp_connection()
+                    except Exception as reconnect_error:
+                        # 다시 연결하지 못하면 남은 메일도 'sending' 에 묶이지 않도록 재시도 대상으로
+                        for row in rows[position + 1:]:
+                            self._mark_failed(row[0], row[4], reconnect_error)
+                        return False
+                    continue
+                except Exception as e:
+                    self._mark_failed(outbox_id, attempts, e)
+                    continue
+                execute(
+                    "UPDATE email_outbox SET status = 'sent', attempts = %s, sent_at = %s, last_error = NULL WHERE id = %s",
+                    (attempts + 1, datetime.now(), outbox_id),
+                )
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+        return True
+
+    # 실패한 메일은 지수 백오프로 다시 대기시키고, 최대 횟수를 넘으면 실패로 표시
+    def _mark_failed(self, outbox_id, attempts, error):
+        attempts += 1
+        print(f"Error occurred while sending an email ({outbox_id}): {error}")
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            status, next_attempt_at = 'failed', datetime.now()
+        else:
+            status = 'pending'
+            next_attempt_at = datetime.now() + timedelta(seconds=OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+        sql = """
+        UPDATE email_outbox SET status = %s, attempts = %s, next_attempt_at = %s, last_error = %s, claim_token = NULL
+        WHERE id = %s
+        """
+        execute(sql, (status, attempts, next_attempt_at, str(error), outbox_id))
+
+
+# 서버 프로세스에 하나만 실행되는 발송 스레드
+@st.cache_resource
+def get_outbox_sender():
+    return OutboxSender()
@@ -0,0 +1,239 @@
+import os
+import gzip
+import json
+import argparse
+import time
+import threading
+from datetime import date, datetime, timedelta
+import streamlit as st
+from codec import CODEC_HEADER, encode_json
+from db import execute, transaction
+from schema import RESULT_TABLES, ensure_schema, table_columns, table_partitions
+from turns import load_turns
+
+ARCHIVE_BATCH_SIZE = 200  # 한 번에 보관 테이블로 옮기는 행 수
+TRANSCRIPT_TABLES = ("interview", "ielts")  # chat 에 턴 세션 참조가 있을 수 있는 테이블
+
+
+# 학기 시작 월 (.env 의 RETENTION_TERM_START_MONTHS, 기본값: 3월, 9월)
+def term_start_months():
+    return sorted(int(month) for month in os.getenv("RETENTION_TERM_START_MONTHS", "3,9").split(","))
+
+
+# moment 가 속한 학기의 시작 시각
+def term_start(moment):
+    months = term_start_months()
+    earlier = [month for month in months if month <= moment.month]
+    if earlier:
+        return datetime(moment.year, earlier[-1], 1)
+    return datetime(moment.year - 1, months[-1], 1)
+
+
+def next_term_start(start):
+    months = term_start_months()
+    later = [month for month in months if month > start.month]
+    if later:
+        return datetime(start.year, later[0], 1)
+    return datetime(start.year + 1, months[0], 1)
+
+
+# 이 시각 이전 기록은 보관 테이블로 옮김 (현재 학기를 포함해 RETENTION_HOT_TERMS 개 학기만 결과 테이블에 유지)
+def archive_cutoff(now=None):
+    start = term_start(now or datetime.now())
+    for _ in range(int(os.getenv("RETENTION_HOT_TERMS", "2")) - 1):
+        start = term_start(start - timedelta(days=1))
+    return start
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return datetime.fromisoformat(str(value))
+
+
+# 보관 테이블에 start 학기 파티션이 없으면 MAXVALUE 파티션을 나눠 추가
+def ensure_term_partition(archive, start):
+    name = f"p{start:%Y%m}"
+    if name in table_partitions(archive):
+        return
+    end = next_term_start(start)
+    execute(
+        f"ALTER TABLE {archive} REORGANIZE PARTITION pmax INTO "
+        f"(PARTITION {name} VALUES LESS THAN ('{end:%Y-%m-%d %H:%M:%S}'), PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+    )
+
+
+# 결과 테이블에 나중에 추가된 컬럼을 보관 테이블에도 추가하고, 공통 컬럼 목록을 반환
+def sync_archive_columns(table):
+    archive = f"{table}_archive"
+    rows = execute(
+        "SELECT COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table,),
+        fetch="all",
+    )
+    archived = table_columns(archive)
+    for column, column_type in rows:
+        if column.lower() not in archived:
+            execute(f"ALTER TABLE {archive} ADD COLUMN {column} {column_type} NULL")
+    return [column for column, _ in rows]
+
+
+# 턴 세션 참조로 저장된 대화는 압축된 전체 대화로 바꿔 보관 행만으로 읽을 수 있게 함 (세션 id 목록 반환)
+def _inline_transcript(row, chat_index):
+    chat = row[chat_index]
+    if not chat or chat.startswith(CODEC_HEADER):
+        return None
+    reference = json.loads(chat)
+    if not isinstance(reference, dict) or "session_id" not in reference:
+        return None
+    row[chat_index] = encode_json(load_turns(reference["session_id"]))
+    return reference["session_id"]
+
+
+# 한 테이블의 cutoff 이전 기록을 학기별 파티션으로 옮기는 함수 (옮긴 행 수 반환)
+# 묶음마다 보관 테이블에 넣기와 결과 테이블에서 지우기를 한 트랜잭션으로 실행하고,
+# 보관 테이블에 같은 (id, 날짜) 행이 있는 것만 지우므로 보관되지 않은 행은 결과 테이블에 그대로 남음
+def archive_table(table, cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    ensure_schema()
+    archive = f"{table}_archive"
+    time_column = RESULT_TABLES[table]
+    columns = sync_archive_columns(table)
+    chat_index = columns.index("chat") if table in TRANSCRIPT_TABLES else None
+    time_index = columns.index(time_column)
+    id_index = columns.index("id")
+    column_list = ", ".join(columns)
+    placeholders = ", ".join(["%s"] * len(columns))
+    moved = 0
+    while True:
+        rows = execute(
+            f"SELECT {column_list} FROM {table} WHERE {time_column} < %s ORDER BY {time_column}, id LIMIT %s",
+            (cutoff, batch_size),
+            fetch="all",
+        )
+        if not rows:
+            return moved
+        for start in sorted({term_start(_as_datetime(row[time_index])) for row in rows}):
+            ensure_term_partition(archive, start)
+
+        # 턴 세션 참조는 트랜잭션 밖에서 미리 전체 대화로 바꿔 둠 (id -> 세션 id)
+        rows = [list(row) for row in rows]
+        session_ids = {}
+        if chat_index is not None:
+            for row in rows:
+                session_id = _inline_transcript(row, chat_index)
+                if session_id:
+                    session_ids[row[id_index]] = session_id
+
+        ids = [row[id_index] for row in rows]
+        id_placeholders = ", ".join(["%s"] * len(ids))
+        with transaction() as cursor:
+            # 이미 보관된 (id, 날짜) 는 그대로 두고, 값 변환 오류는 IGNORE 로 숨기지 않고 묶음 전체를 되돌림
+            for row in rows:
+                cursor.execute(
+                    f"INSERT INTO {archive} ({column_list}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE id = id",
+                    tuple(row),
+                )
+            cursor.execute(
+                f"DELETE h FROM {table} h JOIN {archive} a ON a.id = h.id AND a.{time_column} = h.{time_column} "
+                f"WHERE h.id IN ({id_placeholders})",
+                tuple(ids),
+            )
+            cursor.execute(f"SELECT id FROM {table} WHERE id IN ({id_placeholders})", tuple(ids))
+            remaining = {row[0] for row in cursor.fetchall()}
+            archived = [record_id for record_id in ids if record_id not in remaining]
+            archived_sessions = [session_ids[record_id] for record_id in archived if record_id in session_ids]
+            if archived_sessions:
+                session_placeholders = ", ".join(["%s"] * len(archived_sessions))
+                cursor.execute(f"DELETE FROM interview_turn WHERE session_id IN ({session_placeholders})", tuple(archived_sessions))
+                cursor.execute(f"DELETE FROM interview_session WHERE session_id IN ({session_placeholders})", tuple(archived_sessions))
+        if not archived:
+            # 옮기지 못한 행만 남은 묶음이면 같은 행을 반복해서 읽지 않도록 멈춤
+            return moved
+        moved += len(archived)
+
+
+def archive_closed_terms(now=None):
+    cutoff = archive_cutoff(now)
+    return {table: archive_table(table, cutoff) for table in RESULT_TABLES}
+
+
+# id 로 레코드를 불러오는 함수 (결과 테이블에 없으면 보관 테이블에서 찾음)
+def fetch_by_id(table, columns, record_id):
+    row = execute(f"SELECT {columns} FROM {table} WHERE id = %s", (record_id,), fetch="one")
+    if row is None:
+        row = execute(f"SELECT {columns} FROM {table}_archive WHERE id = %s", (record_id,), fetch="one")
+    return row
+
+
+# 조회 대상 테이블 (조회 시작 날짜가 보관 기준 이전이면 보관 테이블까지 합친 columns 조회)
+def records_source(table, columns, date_from=None):
+    if date_from is not None and _as_datetime(date_from) < archive_cutoff():
+        return f"(SELECT {columns} FROM {table} UNION ALL SELECT {columns} FROM {table}_archive) AS {table}"
+    return table
+
+
+# 보관 테이블의 한 학기 파티션을 gzip 압축 JSON Lines 파일로 내보내는 함수 (백업용)
+def export_term(table, start, directory):
+    archive = f"{table}_archive"
+    rows = execute(f"SELECT * FROM {archive} PARTITION (p{start:%Y%m})", fetch="all")
+    columns = list(table_columns(archive))
+    path = os.path.join(directory, f"{archive}_{start:%Y%m}.jsonl.gz")
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n")
+    return path, len(rows)
+
+
+# 지난 학기 기록을 주기적으로 보관 테이블로 옮기는 스레드 (.env 의 RETENTION_INTERVAL_HOURS 간격)
+class Archiver:
+    def __init__(self):
+        self._thread = threading.Thread(target=self._run, name="result-archiver", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        interval = float(os.getenv("RETENTION_INTERVAL_HOURS", "6")) * 60 * 60
+        while True:
+            try:
+                moved = archive_closed_terms()
+                if any(moved.values()):
+                    print(f"Archived closed terms: {moved}")
+            except Exception as e:
+                print(f"Error while archiving closed terms: {e}")
+            time.sleep(interval)
+
+
+# 서버 프로세스에 하나만 실행되는 보관 스레드 (RETENTION_SCHEDULE=false 이면 실행하지 않음)
+@st.cache_resource
+def get_archiver():
+    if os.getenv("RETENTION_SCHEDULE", "true").lower() != "true":
+        return None
+    return Archiver()
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Move closed terms of the result tables to their archive tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("archive", help="archive every record older than the hot terms")
+    export = subparsers.add_parser("export", help="write one archived term to a .jsonl.gz file")
+    export.add_argument("table", choices=list(RESULT_TABLES))
+    export.add_argument("term", help="term start as YYYY-MM, e.g. 2024-03")
+    export.add_argument("--directory", default="archive")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        print(f"Archiving records before {archive_cutoff():%Y-%m-%d}")
+        for table, moved in archive_closed_terms().items():
+            print(f"{table}: {moved} rows archived")
+    else:
+        path, count = export_term(args.table, datetime.strptime(args.term, "%Y-%m"), args.directory)
+        print(f"{count} rows written to {path}")
+
+
+if __name__ == "__main__":
+    main()
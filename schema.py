@@ -0,0 +1,265 @@
+from datetime import datetime
+import mysql.connector
+from mysql.connector import errorcode
+import streamlit as st
+from db import execute
+
+TEXT_TYPES = ("tinytext", "text", "mediumtext", "longtext", "blob", "mediumblob", "longblob")
+INDEX_PREFIX_LENGTH = 191  # TEXT 컬럼에 인덱스를 만들 때 사용하는 앞부분 길이
+# 다른 프로세스가 동시에 같은 변경을 먼저 적용했을 때 무시할 오류
+ALREADY_APPLIED_ERRORS = (errorcode.ER_DUP_FIELDNAME, errorcode.ER_DUP_KEYNAME, errorcode.ER_TABLE_EXISTS_ERROR)
+
+
+# 결과 테이블 -> 날짜 컬럼
+RESULT_TABLES = {
+    "interview": "time",
+    "ielts": "time",
+    "long_tab": "date",
+    "short_tab": "date",
+    "cog_table": "date",
+}
+
+
+def _execute_ddl(sql):
+    try:
+        execute(sql)
+    except mysql.connector.Error as error:
+        if error.errno not in ALREADY_APPLIED_ERRORS:
+            raise
+
+
+def table_columns(table):
+    rows = execute(
+        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table,),
+        fetch="all",
+    )
+    return {name.lower(): data_type.lower() for name, data_type in rows}
+
+
+# 테이블의 인덱스 이름 -> 컬럼 목록
+def table_indexes(table):
+    rows = execute(
+        """
+        SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """,
+        (table,),
+        fetch="all",
+    )
+    indexes = {}
+    for index_name, column in rows:
+        indexes.setdefault(index_name, []).append(column.lower())
+    return indexes
+
+
+def create_table(table, definition):
+    _execute_ddl(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+
+
+def create_table_like(table, source):
+    _execute_ddl(f"CREATE TABLE IF NOT EXISTS {table} LIKE {source}")
+
+
+# 직접 만든 테이블에 기본 키가 없으면 자동 증가 id 를 기본 키로 추가
+# (키가 아닌 id 컬럼이 이미 있으면 그 컬럼을 기본 키로 바꿈)
+def ensure_primary_key(table):
+    if "PRIMARY" in table_indexes(table):
+        return
+    if "id" in table_columns(table):
+        execute(f"ALTER TABLE {table} MODIFY COLUMN id INT NOT NULL AUTO_INCREMENT, ADD PRIMARY KEY (id)")
+    else:
+        _execute_ddl(f"ALTER TABLE {table} ADD COLUMN id INT AUTO_INCREMENT PRIMARY KEY FIRST")
+
+
+def add_column(table, column, definition):
+    if column not in table_columns(table):
+        _execute_ddl(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# 컬럼 종류가 allowed 에 없으면 definition 으로 변경 (예: TEXT -> MEDIUMTEXT)
+def change_column_type(table, column, definition, allowed):
+    data_type = table_columns(table).get(column)
+    if data_type is not None and data_type not in allowed:
+        _execute_ddl(f"ALTER TABLE {table} MODIFY COLUMN {column} {definition}")
+
+
+# 같은 컬럼으로 시작하는 인덱스가 없을 때만 인덱스 추가 (직접 만든 인덱스와 중복되지 않도록)
+def add_index(table, index_name, columns):
+    if any(existing[:len(columns)] == list(columns) for existing in table_indexes(table).values()):
+        return
+    types = table_columns(table)
+    parts = [f"{column}({INDEX_PREFIX_LENGTH})" if types.get(column) in TEXT_TYPES else column for column in columns]
+    _execute_ddl(f"ALTER TABLE {table} ADD INDEX {index_name} ({', '.join(parts)})")
+
+
+def _create_result_tables():
+    create_table("interview", """
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        chat MEDIUMTEXT NOT NULL,
+        time DATETIME NOT NULL
+    """)
+    create_table("ielts", """
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        chat MEDIUMTEXT NOT NULL,
+        time DATETIME NOT NULL
+    """)
+    answers = ",\n".join(f"answer{i} TEXT NULL" for i in range(1, 8))
+    corrects = ",\n".join(f"correct{i} FLOAT NULL" for i in range(1, 8))
+    create_table("long_tab", f"""
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        date DATETIME NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        correct_answers INT NOT NULL,
+        time_taken FLOAT NOT NULL,
+        {answers},
+        {corrects}
+    """)
+    create_table("short_tab", """
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        date DATETIME NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        correct_count INT NOT NULL,
+        input_time FLOAT NOT NULL,
+        correct_words TEXT NULL,
+        user_input TEXT NULL
+    """)
+    create_table("cog_table", """
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        date DATETIME NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        mode VARCHAR(32) NOT NULL,
+        max_success_length INT NOT NULL,
+        max_success_time FLOAT NULL,
+        accuracy FLOAT NOT NULL,
+        user_activity MEDIUMTEXT NOT NULL
+    """)
+    for table in RESULT_TABLES:
+        ensure_primary_key(table)
+
+
+# 이메일, 날짜, 이름 조회용 보조 인덱스 (eval_app 의 검색과 최신순 페이지 조회가 인덱스를 사용하도록)
+def _add_result_indexes():
+    for table, time_column in RESULT_TABLES.items():
+        add_index(table, f"idx_{table}_email", ["email"])
+        add_index(table, f"idx_{table}_{time_column}", [time_column])
+        add_index(table, f"idx_{table}_name", ["name"])
+
+
+# 긴 대화 기록과 활동 기록이 TEXT(64KB) 에서 잘리지 않도록 MEDIUMTEXT 로 변경
+def _widen_transcript_columns():
+    wide = ("mediumtext", "longtext")
+    change_column_type("interview", "chat", "MEDIUMTEXT NOT NULL", wide)
+    change_column_type("ielts", "chat", "MEDIUMTEXT NOT NULL", wide)
+    change_column_type("cog_table", "user_activity", "MEDIUMTEXT NOT NULL", wide)
+
+
+# 면담/검사별 토큰 사용량 합계 컬럼 (ledger.py)
+def _add_usage_columns():
+    for table in ("interview", "ielts", "long_tab"):
+        add_column(table, "prompt_tokens", "INT NOT NULL DEFAULT 0")
+        add_column(table, "completion_tokens", "INT NOT NULL DEFAULT 0")
+        add_column(table, "cost_usd", "DECIMAL(10, 6) NOT NULL DEFAULT 0")
+
+
+def table_partitions(table):
+    rows = execute(
+        """
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (table,),
+        fetch="all",
+    )
+    return [row[0] for row in rows]
+
+
+# 지난 학기 기록을 옮겨 두는 보관 테이블 (retention.py)
+# 결과 테이블과 같은 컬럼과 인덱스를 갖고, 압축 행 형식으로 날짜 컬럼 기준 학기별 파티션을 나눔
+# 파티션 키가 기본 키에 포함되어야 하므로 기본 키는 (id, 날짜)
+def _create_archive_tables():
+    for table, time_column in RESULT_TABLES.items():
+        archive = f"{table}_archive"
+        create_table_like(archive, table)
+        if table_indexes(archive).get("PRIMARY") == ["id"]:
+            _execute_ddl(f"ALTER TABLE {archive} MODIFY id INT NOT NULL, DROP PRIMARY KEY, ADD PRIMARY KEY (id, {time_column})")
+        if not table_partitions(archive):
+            _execute_ddl(
+                f"ALTER TABLE {archive} ROW_FORMAT=COMPRESSED "
+                f"PARTITION BY RANGE COLUMNS({time_column}) (PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+            )
+
+
+# (버전, 설명, 적용 함수) 목록, 새 변경은 항상 끝에 다음 번호로 추가
+# 각 함수는 이미 적용된 부분을 건너뛰므로 직접 만든 테이블에도 안전하게 다시 실행할 수 있음
+MIGRATIONS = [
+    (1, "Create result tables", _create_result_tables),
+    (2, "Add email, date and name indexes to result tables", _add_result_indexes),
+    (3, "Use MEDIUMTEXT for chat and user_activity", _widen_transcript_columns),
+    (4, "Add token usage columns", _add_usage_columns),
+    (5, "Create term-partitioned archive tables", _create_archive_tables),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version():
+    execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+    """)
+    row = execute("SELECT MAX(version) FROM schema_version", fetch="one")
+    return row[0] if row and row[0] is not None else 0
+
+
+# 아직 적용되지 않은 변경을 순서대로 적용하고 적용한 버전 목록을 반환하는 함수
+def migrate():
+    version = current_version()
+    applied = []
+    for migration_version, description, apply in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        apply()
+        execute(
+            "INSERT IGNORE INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)",
+            (migration_version, description, datetime.now()),
+        )
+        applied.append(migration_version)
+    return applied
+
+
+# 앱이 서버에서 처음 실행될 때 스키마를 최신 버전으로 맞추는 함수 (프로세스당 한 번만 실행)
+@st.cache_resource
+def ensure_schema():
+    return migrate()
+
+
+# 결과를 저장하기 전에 스키마가 최신 버전인지만 확인하는 함수 (테이블 변경은 하지 않음)
+# 응시자가 제출을 기다리는 동안 테이블을 다시 만드는 변경이 실행되지 않도록 저장 경로에서는 이 함수를 사용
+@st.cache_resource
+def require_schema():
+    version = current_version()
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema is at version {version}, expected {SCHEMA_VERSION}; run python schema.py")
+    return version
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    applied = migrate()
+    if applied:
+        print(f"Applied migrations {applied}; schema is at version {SCHEMA_VERSION}")
+    else:
+        print(f"Schema is already at version {SCHEMA_VERSION}")
@@ -0,0 +1,94 @@
+# 문항별 모범 답안과 핵심어 묶음 (한 묶음 안의 표현 중 하나만 있으면 그 핵심어를 언급한 것으로 봄)
+# correct_at: 채점 모델 호출이 실패했을 때 이만큼의 핵심어 묶음을 언급하면 정답으로 추정
+# local_correct: False 이면 두 개념을 바꿔 말해도 핵심어가 모두 맞으므로 정답 판정은 항상 채점 모델에 맡김
+reference_answers = [
+    {
+        "answer": "에이전트가 주어진 환경과 상호작용하며 보상을 최대화하는 행동을 스스로 학습하는 기계 학습의 한 분야",
+        "key_phrases": [["에이전트", "agent", "프로그램", "컴퓨터"], ["환경", "상호작용"], ["보상", "reward"], ["행동", "결정", "선택"]],
+        "correct_at": 3,
+    },
+    {
+        "answer": "지도 학습은 입력과 정답을 알려 주지만 강화 학습은 에이전트가 스스로 환경과 상호작용하며 보상을 통해 정답을 찾아낸다",
+        "key_phrases": [["정답", "레이블", "label", "답을 알려"], ["스스로", "직접", "상호작용", "시행착오"], ["보상", "reward"]],
+        "correct_at": 2,
+        "local_correct": False,
+    },
+    {
+        "answer": "새로운 행동을 시도하지 않으면 더 나은 보상을 놓칠 수 있기 때문에 탐색과 이용의 균형이 중요하다",
+        "key_phrases": [["새로운", "새 행동", "시도"], ["더 나은", "더 좋은", "더 큰", "최적"], ["보상", "reward"], ["놓치", "놓칠", "잃", "못 찾", "못찾"]],
+        "correct_at": 3,
+    },
+    {
+        "answer": "탐색은 새로운 행동을 시도해 보는 것이고 이용은 이미 알고 있는 행동 중 가장 좋은 것을 선택하는 것이다",
+        "key_phrases": [["탐색", "exploration"], ["새로운", "새 행동", "시도"], ["이용", "exploitation", "활용"], ["알고 있는", "아는", "기존", "이미", "경험"]],
+        "correct_at": 4,
+        "local_correct": False,
+    },
+    {
+        "answer": "로봇 공학, 자율 주행 자동차, 게임, 바둑 등에서 응용될 수 있다",
+        "key_phrases": [["로봇", "robot"], ["자율 주행", "자율주행", "자동차", "self-driving"], ["게임", "바둑", "game"]],
+        "correct_at": 1,
+    },
+    {
+        "answer": "주어진 환경에서 보상을 최대화하는 최상의 행동이나 결정을 찾는 것",
+        "key_phrases": [["보상", "reward"], ["최대", "최상", "최적", "극대", "가장 좋은"], ["행동", "결정", "전략", "방법"]],
+        "correct_at": 2,
+    },
+    {
+        "answer": "비디오 게임을 플레이하는 프로그램, 바둑을 두는 인공지능, 장애물을 피하는 로봇, 자율 주행 자동차",
+        "key_phrases": [["게임", "바둑", "알파고", "로봇", "자율 주행", "자율주행", "자동차", "레스토랑", "game", "robot"]],
+        "correct_at": 1,
+    },
+]
+
+WRONG_SIMILARITY = 0.15  # 핵심어가 없고 모범 답안과의 유사도가 이보다 낮으면 오답으로 처리
+CORRECT_SIMILARITY = 0.6  # 핵심어를 모두 언급하고 모범 답안과의 유사도가 이 이상이면 정답으로 처리
+# 부정 표현 (모범 답안에 없는 부정 표현이 답안에 있으면 뜻이 뒤집혔을 수 있으므로 정답 처리하지 않음)
+NEGATION_MARKERS = ["않", "아니", "없", "못", "모르", "not", "n't", "never"]
+
+# 공백을 없애고 소문자로 바꿔 띄어쓰기 차이를 무시하는 함수
+def normalize_answer(text):
+    return "".join(text.lower().split())
+
+# 답안의 글자 2-gram 중 모범 답안에도 있는 비율 (0~1)
+def bigram_similarity(answer, reference):
+    answer_bigrams = {answer[i:i + 2] for i in range(len(answer) - 1)}
+    reference_bigrams = {reference[i:i + 2] for i in range(len(reference) - 1)}
+    if not answer_bigrams:
+        return 0.0
+    return len(answer_bigrams & reference_bigrams) / len(answer_bigrams)
+
+# 답안에서 언급한 핵심어 묶음 수를 세는 함수
+def count_key_phrases(answer, key_phrases):
+    return sum(1 for phrases in key_phrases if any(normalize_answer(phrase) in answer for phrase in phrases))
+
+def negations(text):
+    return {marker for marker in NEGATION_MARKERS if marker in text}
+
+# 채점 모델 없이 확실한 문항만 채점하는 함수 (확실하지 않으면 None)
+# 빈 답과 핵심어도 유사도도 없는 답은 0점, 모든 핵심어를 언급하고 모범 답안과 거의 같으며
+# 새로운 부정 표현이 없는 답은 1점으로 처리하고, 핵심어 일부만 맞은 답은 채점 모델에 보냄
+def pre_score_answer(answer, reference):
+    answer = normalize_answer(answer)
+    if not answer:
+        return 0
+    model_answer = normalize_answer(reference["answer"])
+    matched = count_key_phrases(answer, reference["key_phrases"])
+    similarity = bigram_similarity(answer, model_answer)
+    if matched == 0 and similarity < WRONG_SIMILARITY:
+        return 0
+    if (
+        reference.get("local_correct", True)
+        and matched == len(reference["key_phrases"])
+        and similarity >= CORRECT_SIMILARITY
+        and negations(answer) <= negations(model_answer)
+    ):
+        return 1
+    return None
+
+# 채점 모델을 쓸 수 없을 때 핵심어 수로 점수를 추정하는 함수
+def estimate_score(answer, reference):
+    matched = count_key_phrases(normalize_answer(answer), reference["key_phrases"])
+    if matched >= reference["correct_at"]:
+        return 1
+    return 0.5 if matched > 0 else 0
@@ -1,21 +1,16 @@
 import streamlit as st
 import random
-import time
 import re
 import mysql.connector
 from datetime import datetime
 from dotenv import load_dotenv
-import os
+from db import execute
+from schema import require_schema
+from stimulus import stimulus_trial
 
 # Load environment variables
 load_dotenv()
 
-# Database connection parameters
-DB_HOST = os.getenv("DB_HOST")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_DATABASE = os.getenv("DB_DATABASE")
-
 # 한글 과일 이름 리스트
 fruits = [
     "사과", "바나나", "포도", "오렌지", "체리", "복숭아", "레몬", "라임", "멜론", "베리",
@@ -26,14 +21,7 @@ fruits = [
 
 def save_to_database(name, email, correct_count, input_time, correct_words, user_input):
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_DATABASE
-        )
-        cursor = connection.cursor()
-
+        require_schema()
         query = """
         INSERT INTO short_tab (date, name, email, correct_count, input_time, correct_words, user_input)
         VALUES (%s, %s, %s, %s, %s, %s, %s)
@@ -48,15 +36,10 @@ def save_to_database(name, email, correct_count, input_time, correct_words, user
             user_input
         )
 
-        cursor.execute(query, values)
-        connection.commit()
+        execute(query, values)
         return True, "Results submitted and saved successfully to the database!"
-    except mysql.connector.Error as error:
+    except (mysql.connector.Error, RuntimeError) as error:  # RuntimeError: 스키마가 최신 버전이 아님
         return False, f"Failed to save results to database: {error}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
 # Streamlit app starts here
 st.title("Cognitive Memory Test")
@@ -84,7 +67,7 @@ if 'state' not in st.session_state:
         'test_phase': 'start',
         'short_term_words': [],
         'countdown': 30,
-        'recall_start_time': None,
+        'trial': 0,
         'results': None,
         'submitted': False,
         'submit_message': None
@@ -100,7 +83,7 @@ if not state['user_submitted']:
             state['name'] = name
             state['email'] = email
             state['user_submitted'] = True
-            st.experimental_rerun()
+            st.rerun()
         else:
             st.warning("Please enter your name and email before proceeding.")
 else:
@@ -109,40 +92,28 @@ else:
         st.write("이 테스트에서는 10개의 과일 이름을 보여드리고, 30초 동안 기억하셔야 합니다.")
         if st.button("테스트 시작"):
             state['short_term_words'] = random.sample(fruits, 10)
+            state['trial'] += 1
             state['test_phase'] = 'show_words'
-            st.experimental_rerun()
+            st.rerun()
 
     elif state['test_phase'] == 'show_words':
         st.write("다음 과일 이름을 기억하세요:")
-        st.write(", ".join(state['short_term_words']))
-
-        progress_bar = st.progress(100)
-        countdown_placeholder = st.empty()
-
-        for i in range(30, 0, -1):
-            countdown_placeholder.write(f"{i}초 남았습니다...")
-            progress_bar.progress(i / 30)
-            time.sleep(1)
-            state['countdown'] = i
-            if i == 1:  # Last iteration
-                state['test_phase'] = 'recall'
-                state['recall_start_time'] = time.time()
-        st.experimental_rerun()
-
-    elif state['test_phase'] == 'recall':
-        user_input = st.text_area("기억나는 과일 이름을 입력하세요:", value=state['results']['user_input'] if state['results'] else "")
-
-        # 두 개의 컬럼 생성
-        col1, col2 = st.columns(2)
-
-        with col1:
-            submit_button = st.button("제출")
 
-        with col2:
-            restart_button = st.button("테스트 다시 시작")
+        # 30초 제시와 입력 시간 측정은 브라우저에서 처리 (서버 스레드를 붙잡지 않음)
+        result = stimulus_trial(
+            trial=state['trial'],
+            stimuli=[", ".join(state['short_term_words'])],
+            stimulus_ms=state['countdown'] * 1000,
+            countdown_label="남은 시간(초):",
+            response="textarea",
+            prompt="기억나는 과일 이름을 입력하세요:",
+            submit_label="제출",
+            key=f"trial_{state['trial']}",
+        )
 
-        if not state['submitted'] and submit_button:
-            input_time = time.time() - state['recall_start_time']
+        if result is not None and not state['submitted']:
+            user_input = result['input']
+            input_time = result['response_time'] / 1000
 
             # Process user input
             user_words = set(filter(None, re.split(r'\s|,|\.', user_input)))
@@ -166,10 +137,15 @@ else:
                 user_input
             )
 
-            state['submitted'] = True
+            state['submitted'] = success
             state['submit_message'] = message
+            state['test_phase'] = 'recall'
+
+            st.rerun()
 
-            st.experimental_rerun()
+    elif state['test_phase'] == 'recall':
+        st.text_area("기억나는 과일 이름을 입력하세요:", value=state['results']['user_input'] if state['results'] else "", disabled=True)
+        restart_button = st.button("테스트 다시 시작")
 
         if state['results']:
             st.write(f"당신은 {state['results']['correct_count']}개의 과일 이름을 맞췄습니다.")
@@ -186,8 +162,7 @@ else:
             state['test_phase'] = 'start'
             state['short_term_words'] = []
             state['countdown'] = 30
-            state['recall_start_time'] = None
             state['results'] = None
             state['submitted'] = False
             state['submit_message'] = None
-            st.experimental_rerun()
\ No newline at end of file
+            st.rerun()
@@ -0,0 +1,35 @@
+import os
+import streamlit.components.v1 as components
+
+# 브라우저에서 자극 제시와 반응 시간 측정을 처리하는 컴포넌트
+_stimulus_component = components.declare_component(
+    "stimulus_trial",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "stimulus_component"),
+)
+
+
+# 자극 목록을 브라우저에서 순서대로 보여준 뒤 응답과 키 입력 시각을 받아오는 함수
+# stimuli: 순서대로 보여줄 자극 (빈 리스트면 바로 응답 단계)
+# stimulus_ms: 자극 하나를 보여주는 시간 (밀리초), gap_ms: 자극 사이 빈 화면 시간
+# response: "text" (Enter로 제출) 또는 "textarea" (제출 버튼으로 제출)
+# 반환값은 trial 이 같은 응답이 들어왔을 때만 dict, 그 전에는 None
+#   input: 입력 내용, response_time: 응답 시작부터 제출까지 (ms), first_key_time: 첫 키 입력까지 (ms)
+#   keystrokes: [{"key", "t"}] (응답 시작 기준 ms), presentation: [{"stimulus", "onset", "offset"}]
+def stimulus_trial(trial, stimuli, stimulus_ms=1000, gap_ms=0, start_delay_ms=0, countdown_label=None,
+                   response="text", prompt="", submit_label="Submit", key=None):
+    value = _stimulus_component(
+        trial=trial,
+        stimuli=list(stimuli),
+        stimulus_ms=stimulus_ms,
+        gap_ms=gap_ms,
+        start_delay_ms=start_delay_ms,
+        countdown_label=countdown_label,
+        response=response,
+        prompt=prompt,
+        submit_label=submit_label,
+        key=key,
+        default=None,
+    )
+    if value is None or value.get("trial") != trial:
+        return None
+    return value
@@ -1,19 +1,32 @@
 import streamlit as st
-from openai import OpenAI
 import os
 import json
-from dotenv import load_dotenv
 import mysql.connector
+from dotenv import load_dotenv
+import time
 from datetime import datetime
+from codec import encode_json
+from context import build_context
+from db import execute
+from ledger import end_session_ledger, session_ledger
+from llm import get_openai_client, stream_chat_completion
+from metrics import span, traced
+from schema import require_schema
+from turns import append_turn, complete_session, flush_turns, start_session
 
 load_dotenv()  # .env 파일 로드
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 MODEL = 'gpt-4o'
 TEMPERATURE = 0.0
+STREAMING = True  # 응답을 토큰 단위로 스트리밍하여 출력
+TURN_BLOCK_SIZE = 10  # 대화 기록을 이 개수만큼 묶어 한 번에 출력
 
-# OpenAI API 키 설정
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# OpenAI API 설정 (프로세스 전체에서 공유하는 클라이언트)
+client = get_openai_client()
+
+# 이 면담의 토큰 사용량 장부 (이번 실행의 모든 LLM 호출을 기록)
+usage_ledger = session_ledger("stream_app")
 
 # 초기 프롬프트 설정
 initial_prompt_en = (
@@ -54,6 +67,7 @@ if language == "English":
     submit_button_label = "Submit"
     save_message = "The conversation has been saved."
     error_message = "You must enter your name and email."
+    save_error_message = "The conversation could not be saved. Please tell the examiner:"
 else:
     initial_prompt = initial_prompt_kr
     title = "인터뷰 챗봇"
@@ -68,6 +82,7 @@ else:
     submit_button_label = "제출하기"
     save_message = "대화 내용이 저장되었습니다."
     error_message = "사용자 이름과 이메일을 입력해야 합니다."
+    save_error_message = "대화 내용을 저장하지 못했습니다. 감독자에게 알려 주세요:"
 
 # 대화 기록 초기화
 if "messages" not in st.session_state:
@@ -76,20 +91,60 @@ else:
     # 언어가 변경되었을 때 프롬프트를 업데이트
     st.session_state["messages"][0] = {"role": "system", "content": initial_prompt}
 
+# 마지막 대화 턴을 백그라운드에서 저장하는 함수 (브라우저가 종료되어도 대화가 남도록)
+def autosave_last_turn():
+    if "session_id" not in st.session_state:
+        return
+    turn_index = len(st.session_state["messages"]) - 1
+    future = append_turn(st.session_state["session_id"], turn_index, st.session_state["messages"][-1])
+    # 끝난 저장은 목록에서 빼되, 실패한 저장은 제출할 때 flush_turns 가 알 수 있도록 남겨 둠
+    pending = [f for f in st.session_state["pending_turn_writes"] if not f.done() or f.exception() is not None]
+    st.session_state["pending_turn_writes"] = pending + [future]
+
 # 챗봇 응답 함수
+@traced("get_chatgpt_response")
 def get_chatgpt_response(prompt):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     st.session_state["messages"].append({"role": "user", "content": prompt, "timestamp": timestamp})
+    autosave_last_turn()
+
+    # 토큰 예산에 맞춘 컨텍스트 (전체 대화는 st.session_state["messages"]에 그대로 유지)
+    if "context_state" not in st.session_state:
+        st.session_state["context_state"] = {}
+    # 컨텍스트 구성 시간과 전송/절약 토큰 수는 context.build 측정으로 기록
+    with span("context.build") as context_fields:
+        context, context_stats = build_context(client, st.session_state["messages"], st.session_state["context_state"])
+        context_fields.update(context_stats)
+
+    if STREAMING:
+        placeholder = st.empty()
+        answer, timing = stream_chat_completion(
+            client,
+            placeholder,
+            prefix="**AI**: ",
+            model=MODEL,
+            messages=context,
+        )
+        placeholder.empty()  # 완성된 응답은 대화 기록에서 다시 출력
+    else:
+        start_time = time.perf_counter()
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=context,
+        )
+        answer = response.choices[0].message.content
+        generation_time = time.perf_counter() - start_time
+        timing = {"time_to_first_token": generation_time, "generation_time": generation_time}
 
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=st.session_state["messages"],
-    )
-    
-    answer = response.choices[0].message.content
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     st.session_state["messages"].append({"role": "assistant", "content": answer, "timestamp": timestamp})    
+    autosave_last_turn()
+
+    # 턴별 응답 지연 시간 및 절약된 토큰 수 기록
+    if "turn_timings" not in st.session_state:
+        st.session_state["turn_timings"] = []
+    st.session_state["turn_timings"].append({"timestamp": timestamp, **timing, **context_stats})
 
     return answer
 
@@ -102,27 +157,74 @@ def save_to_db():
         st.error(error_message)
         return
     
-    db = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        passwd=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_DATABASE")
-    )
-    cursor = db.cursor()
     now = datetime.now()
 
+    try:
+        require_schema()
+    except (mysql.connector.Error, RuntimeError) as error:  # RuntimeError: 스키마가 최신 버전이 아님
+        st.error(f"{save_error_message} {error}")
+        return
     sql = """
-    INSERT INTO interview (name, email, chat, time)
-    VALUES (%s, %s, %s, %s)
+    INSERT INTO interview (name, email, chat, time, prompt_tokens, completion_tokens, cost_usd)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
     """
-    chat = json.dumps(st.session_state["messages"])  # 대화 내용을 JSON 문자열로 변환
-    val = (name, email, chat, now)
-    cursor.execute(sql, val)
-    db.commit()
-    cursor.close()
-    db.close()
+    session_id = st.session_state.get("session_id")
+    # 대화 내용이 턴마다 빠짐없이 저장되었으면 세션 참조만 저장하고 세션을 완료로 표시
+    # 저장에 실패한 턴이 있으면 턴 기록이 불완전하므로 전체 대화를 저장
+    if session_id and flush_turns(st.session_state["pending_turn_writes"]):
+        chat = json.dumps({"session_id": session_id})
+    else:
+        chat = encode_json(st.session_state["messages"])  # 시스템 프롬프트는 참조로 바꾸고 압축해서 저장
+    val = (name, email, chat, now, *usage_ledger.totals())
+    record_id = execute(sql, val)
+    if session_id:
+        complete_session(session_id, record_id)
+    usage_ledger.link_record("interview", record_id)  # llm_usage 기록을 저장한 면담과 연결
+    end_session_ledger()  # 다음 면담은 새 장부로 기록
     st.success(save_message)
 
+# 대화 한 턴을 출력용 마크다운으로 변환하는 함수
+def format_turn(message):
+    timestamp = message.get("timestamp", "")
+    if message["role"] == "user":
+        return f"**You** ({timestamp}): {message['content']}"
+    return f"**AI** ({timestamp}): {message['content']}"
+
+# 대화 기록 출력 함수
+# 다 찬 블록은 한 번만 변환해 세션에 보관하고, 내용이 같은 큰 메시지는 Streamlit이 캐시된 참조로만 보내므로
+# 재실행 때 이미 출력된 턴을 다시 전송하지 않음
+def render_history():
+    turns = [message for message in st.session_state["messages"] if message["role"] in ("user", "assistant")]
+    if "rendered_blocks" not in st.session_state:
+        st.session_state["rendered_blocks"] = []
+    blocks = st.session_state["rendered_blocks"]
+    while (len(blocks) + 1) * TURN_BLOCK_SIZE <= len(turns):
+        start = len(blocks) * TURN_BLOCK_SIZE
+        blocks.append("\n\n".join(format_turn(message) for message in turns[start:start + TURN_BLOCK_SIZE]))
+
+    for block in blocks:
+        st.markdown(block)
+    for message in turns[len(blocks) * TURN_BLOCK_SIZE:]:
+        st.write(format_turn(message))
+
+# 대화 영역: 메시지를 보내면 이 부분만 다시 실행 (언어 선택, 사용자 정보 폼은 다시 실행하지 않음)
+@st.fragment
+def chat_area():
+    history = st.container()
+
+    # 폼을 사용하여 입력 필드와 버튼 그룹화
+    with st.form(key='my_form', clear_on_submit=True):
+        user_input = st.text_area("You: ", key="user_input")
+        send_button_click = st.form_submit_button(label=send_button)
+
+        if send_button_click and user_input:
+            # 사용자 입력 저장 및 챗봇 응답 생성
+            get_chatgpt_response(user_input)
+
+    # 응답까지 반영된 대화 기록을 폼 위에 출력 (별도 재실행 불필요)
+    with history:
+        render_history()
+
 # Streamlit 애플리케이션
 st.title(title)
 st.write(description)
@@ -135,30 +237,20 @@ with st.form(key='user_info_form'):
 
 # Submit 버튼을 눌렀을 때 초기 대화를 시작
 if user_info_submit:
+    if "session_id" not in st.session_state:
+        session_id, futures = start_session(
+            "interview",
+            st.session_state.get('user_name', '').strip(),
+            st.session_state.get('user_email', '').strip(),
+            st.session_state["messages"][0],
+        )
+        st.session_state["session_id"] = session_id
+        st.session_state["pending_turn_writes"] = futures
     get_chatgpt_response("")
 
-# 대화 기록 출력
-if "messages" in st.session_state:
-    for message in st.session_state["messages"]:
-        role = message["role"]
-        content = message["content"]
-        timestamp = message.get("timestamp", "")
-
-        if role == "user":
-            st.write(f"**You** ({timestamp}): {content}")
-        elif role == "assistant":
-            st.write(f"**AI** ({timestamp}): {content}")
-
-# 폼을 사용하여 입력 필드와 버튼 그룹화
+# 대화 기록 출력 및 입력
 if "user_name" in st.session_state and "user_email" in st.session_state:
-    with st.form(key='my_form', clear_on_submit=True):
-        user_input = st.text_area("You: ", key="user_input")
-        send_button_click = st.form_submit_button(label=send_button)
-
-        if send_button_click and user_input:
-            # 사용자 입력 저장 및 챗봇 응답 생성
-            get_chatgpt_response(user_input)
-            st.experimental_rerun()  # 상태 업데이트 후 즉시 리렌더링
+    chat_area()
 
 # "제출하기" 버튼
 if "user_name" in st.session_state and "user_email" in st.session_state:
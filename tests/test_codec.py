@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("mysql.connector")
+
+import codec
+import turns
+
+SYSTEM_PROMPT = "You are an interviewer. " * 20
+TURNS = [
+    ("system", SYSTEM_PROMPT, None),
+    ("assistant", "Hello. Please introduce yourself.", datetime(2024, 3, 4, 10, 0, 0)),
+    ("user", "My name is Kim.", datetime(2024, 3, 4, 10, 0, 30)),
+]
+
+
+# 테스트에 필요한 쿼리만 흉내 내는 MySQL 대신 쓰는 객체
+class FakeTables:
+    def __init__(self, chat):
+        self.chat = chat
+        self.prompts = {}
+
+    def execute(self, sql, params=None, fetch=None):
+        sql = " ".join(sql.split())
+        if sql.startswith("INSERT IGNORE INTO prompt_store"):
+            self.prompts[params[0]] = params[1]
+        elif sql.startswith("SELECT content FROM prompt_store"):
+            return (self.prompts[params[0]],) if params[0] in self.prompts else None
+        elif sql.startswith("SELECT chat FROM interview "):
+            return (self.chat,)
+        elif sql.startswith("SELECT role, content, timestamp FROM interview_turn"):
+            return [(role, codec.prompt_ref(content) if role == "system" else content, timestamp) for role, content, timestamp in TURNS]
+        return None
+
+
+@pytest.fixture
+def fake_tables(monkeypatch):
+    def install(chat):
+        tables = FakeTables(chat)
+        monkeypatch.setattr(codec, "execute", tables.execute)
+        monkeypatch.setattr(turns, "execute", tables.execute)
+        monkeypatch.setattr(codec, "create_prompt_table", lambda: None)
+        monkeypatch.setattr(turns, "create_turn_tables", lambda: None)
+        codec._load_prompt.cache_clear()
+        codec._stored_prompts.clear()
+        return tables
+    return install
+
+
+def test_export_record_resolves_turn_session_reference(fake_tables):
+    fake_tables(json.dumps({"session_id": "a" * 32}))
+
+    messages = codec.export_record("interview", 1)
+
+    assert [message["role"] for message in messages] == ["system", "assistant", "user"]
+    assert messages[0]["content"] == SYSTEM_PROMPT
+    assert messages[2] == {"role": "user", "content": "My name is Kim.", "timestamp": "2024-03-04 10:00:30"}
+
+
+def test_export_record_decodes_compressed_transcript(fake_tables):
+    tables = fake_tables(None)
+    transcript = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": "Hi"}]
+    tables.chat = codec.encode_json(transcript)
+
+    assert tables.chat.startswith(codec.CODEC_HEADER)
+    assert codec.export_record("interview", 1) == transcript
@@ -0,0 +1,49 @@
+import pytest
+from scoring import CORRECT_SIMILARITY, WRONG_SIMILARITY, bigram_similarity, normalize_answer, pre_score_answer, reference_answers
+
+DEFINITION, DIFFERENCE, BALANCE, TERMS, APPLICATIONS, GOAL, EXAMPLES = reference_answers
+
+
+@pytest.mark.parametrize("answer", ["", "   ", "잘 모르겠어요", "기억이 나지 않습니다"])
+def test_empty_or_unrelated_answers_score_zero(answer):
+    assert pre_score_answer(answer, DEFINITION) == 0
+
+
+@pytest.mark.parametrize("reference, answer", [
+    (DEFINITION, "에이전트가 환경과 상호작용하면서 보상을 최대화하는 행동을 배우는 기계 학습 분야"),
+    (BALANCE, "새로운 행동을 시도하지 않으면 더 나은 보상을 놓칠 수 있기 때문"),
+    (APPLICATIONS, "로봇 공학, 자율 주행 자동차, 게임"),
+    (GOAL, "환경에서 보상을 최대화하는 최상의 행동을 찾는 것"),
+])
+def test_close_paraphrase_with_every_key_phrase_scores_one(reference, answer):
+    assert pre_score_answer(answer, reference) == 1
+
+
+def test_answer_below_correct_similarity_goes_to_model():
+    answer = "보상과 환경, 행동, 에이전트"
+    assert bigram_similarity(normalize_answer(answer), normalize_answer(DEFINITION["answer"])) < CORRECT_SIMILARITY
+    assert pre_score_answer(answer, DEFINITION) is None
+
+
+def test_partial_key_phrases_go_to_model():
+    assert pre_score_answer("보상을 최대화하는 행동을 배우는 것", DEFINITION) is None
+    assert pre_score_answer("로봇", APPLICATIONS) is None
+
+
+def test_added_negation_goes_to_model():
+    answer = "에이전트가 환경과 상호작용하지 않고 보상을 최대화하는 행동을 배우는 기계 학습 분야"
+    assert pre_score_answer(answer, DEFINITION) is None
+
+
+@pytest.mark.parametrize("reference, answer", [
+    (DIFFERENCE, "지도 학습은 에이전트가 스스로 상호작용하며 보상으로 배우고 강화 학습은 입력과 정답을 알려 준다"),
+    (TERMS, "탐색은 이미 알고 있는 행동 중 가장 좋은 것을 선택하고 이용은 새로운 행동을 시도해 보는 것"),
+])
+def test_swapped_concepts_are_never_scored_locally_as_correct(reference, answer):
+    assert pre_score_answer(answer, reference) is None
+
+
+def test_answer_sharing_some_wording_is_not_scored_wrong_locally():
+    answer = "학습하는 분야"
+    assert bigram_similarity(normalize_answer(answer), normalize_answer(DEFINITION["answer"])) >= WRONG_SIMILARITY
+    assert pre_score_answer(answer, DEFINITION) is None
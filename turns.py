@@ -0,0 +1,123 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import streamlit as st
+from codec import decode_json, prompt_ref, resolve_prompt
+from db import execute
+
+
+# 면담 세션 및 턴 테이블 생성 함수 (프로세스당 한 번만 실행)
+@st.cache_resource
+def create_turn_tables():
+    execute("""
+    CREATE TABLE IF NOT EXISTS interview_session (
+        session_id CHAR(32) PRIMARY KEY,
+        app VARCHAR(32) NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        started_at DATETIME NOT NULL,
+        completed_at DATETIME NULL,
+        record_id INT NULL
+    )
+    """)
+    execute("""
+    CREATE TABLE IF NOT EXISTS interview_turn (
+        session_id CHAR(32) NOT NULL,
+        turn_index INT NOT NULL,
+        role VARCHAR(16) NOT NULL,
+        content MEDIUMTEXT NOT NULL,
+        timestamp DATETIME NULL,
+        PRIMARY KEY (session_id, turn_index)
+    )
+    """)
+
+
+# 턴 저장을 백그라운드에서 처리하는 프로세스 공용 스레드 풀
+@st.cache_resource
+def get_turn_writer():
+    return ThreadPoolExecutor(max_workers=int(os.getenv("TURN_WRITER_THREADS", "2")), thread_name_prefix="turn-writer")
+
+
+def _log_write_error(future):
+    if future.exception() is not None:
+        print(f"Error while saving a turn: {future.exception()}")
+
+
+def _submit(fn, *args):
+    create_turn_tables()
+    future = get_turn_writer().submit(fn, *args)
+    future.add_done_callback(_log_write_error)
+    return future
+
+
+def _insert_session(session_id, app, name, email, started_at):
+    sql = """
+    INSERT INTO interview_session (session_id, app, name, email, started_at)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    execute(sql, (session_id, app, name, email, started_at))
+
+
+def _insert_turn(session_id, turn_index, message):
+    # 같은 턴이 다시 저장되어도 한 번만 기록 (append-only)
+    sql = """
+    INSERT IGNORE INTO interview_turn (session_id, turn_index, role, content, timestamp)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    timestamp = message.get("timestamp") or None
+    # 시스템 프롬프트는 세션마다 반복되므로 prompt_store 참조로 저장
+    content = prompt_ref(message["content"]) if message["role"] == "system" else message["content"]
+    execute(sql, (session_id, turn_index, message["role"], content, timestamp))
+
+
+# 새 면담 세션을 만들고 세션 ID를 반환하는 함수
+def start_session(app, name, email, system_message):
+    session_id = uuid.uuid4().hex
+    futures = [
+        _submit(_insert_session, session_id, app, name, email, datetime.now()),
+        _submit(_insert_turn, session_id, 0, system_message),
+    ]
+    return session_id, futures
+
+
+# 대화 한 턴을 백그라운드에서 저장하는 함수
+def append_turn(session_id, turn_index, message):
+    return _submit(_insert_turn, session_id, turn_index, message)
+
+
+# 저장 대기 중인 턴이 모두 기록될 때까지 기다리고, 실패 없이 모두 저장되었는지 반환하는 함수
+def flush_turns(pending):
+    done, _ = wait(list(pending))
+    return all(future.exception() is None for future in done)
+
+
+# 세션을 완료로 표시하고 제출된 레코드와 연결하는 함수
+def complete_session(session_id, record_id):
+    sql = "UPDATE interview_session SET completed_at = %s, record_id = %s WHERE session_id = %s"
+    execute(sql, (datetime.now(), record_id, session_id))
+
+
+# 저장된 턴으로 대화 기록을 다시 만드는 함수
+def load_turns(session_id):
+    create_turn_tables()
+    rows = execute(
+        "SELECT role, content, timestamp FROM interview_turn WHERE session_id = %s ORDER BY turn_index",
+        (session_id,),
+        fetch="all",
+    )
+    messages = []
+    for role, content, timestamp in rows:
+        message = {"role": role, "content": resolve_prompt(content) if role == "system" else content}
+        if timestamp is not None:
+            message["timestamp"] = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        messages.append(message)
+    return messages
+
+
+# chat 컬럼을 대화 기록 리스트로 변환하는 함수 (압축된 값도 풀고, 세션 참조이면 턴 테이블에서 불러옴)
+def load_chat(chat):
+    data = decode_json(chat)
+    if isinstance(data, dict) and "session_id" in data:
+        return load_turns(data["session_id"])
+    return data
@@ -1,22 +1,17 @@
 import streamlit as st
 import random
-import time
 import re
-import json
 import mysql.connector
 from datetime import datetime
 from dotenv import load_dotenv
-import os
+from codec import encode_json
+from db import execute
+from schema import require_schema
+from stimulus import stimulus_trial
 
 # Load environment variables
 load_dotenv()
 
-# Database connection parameters
-DB_HOST = os.getenv("DB_HOST")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_DATABASE = os.getenv("DB_DATABASE")
-
 class DigitSpanTest:
     FORWARD = 0
     BACKWARD = 1
@@ -50,7 +45,7 @@ class DigitSpanTest:
     def generate_sequence(self):
         return [random.choice(self.symbols) for _ in range(self.length)]
 
-    def record_attempt(self, input_sequence, time_taken, is_correct):
+    def record_attempt(self, input_sequence, time_taken, is_correct, keystrokes=None):
         self.total_attempts += 1
         if is_correct:
             self.correct_attempts += 1
@@ -64,20 +59,15 @@ class DigitSpanTest:
             "input_sequence": input_sequence,
             "is_correct": is_correct
         })
+        if keystrokes is not None:
+            self.user_activity[-1]["keystrokes"] = keystrokes
 
     def get_accuracy(self):
         return self.correct_attempts / self.total_attempts if self.total_attempts > 0 else 0
 
 def save_to_database(name, email, mode, test):
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_DATABASE
-        )
-        cursor = connection.cursor()
-
+        require_schema()
         query = """
         INSERT INTO cog_table (date, name, email, mode, max_success_length, max_success_time, accuracy, user_activity)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
@@ -90,20 +80,15 @@ def save_to_database(name, email, mode, test):
             test.max_success_length,
             test.max_success_time,
             test.get_accuracy(),
-            json.dumps(test.user_activity)
+            encode_json(test.user_activity)
         )
 
-        cursor.execute(query, values)
-        connection.commit()
+        execute(query, values)
         st.success("Results saved successfully to the database!")
         st.info(f"Saved data: Mode: {mode}, Max length: {test.max_success_length}, Accuracy: {test.get_accuracy():.2%}")
-    except mysql.connector.Error as error:
+    except (mysql.connector.Error, RuntimeError) as error:  # RuntimeError: 스키마가 최신 버전이 아님
         st.error(f"Failed to save results to database: {error}")
         st.warning("Please check your database connection and try again.")
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
 # Streamlit app starts here
 st.title("Working Memory Test")
@@ -115,10 +100,7 @@ if 'state' not in st.session_state:
         'test_started': False,
         'digit_span_test': None,
         'show_sequence': False,
-        'sequence_complete': False,
-        'current_digit': None,
-        'user_input': '',
-        'start_time': None,
+        'feedback': None,
         'mode': None,
         'input_key': 0  # New: unique key for input field
     }
@@ -133,7 +115,7 @@ if not state['user_submitted']:
             state['name'] = name
             state['email'] = email
             state['user_submitted'] = True
-            st.experimental_rerun()
+            st.rerun()
         else:
             st.warning("Please enter your name and email before starting the test.")
 
@@ -142,96 +124,82 @@ elif not state['mode_selected']:
     if st.button("Confirm Mode"):
         state['mode'] = "Forward" if mode == "Forward" else "Backward"
         state['mode_selected'] = True
-        st.experimental_rerun()
+        st.rerun()
 
 elif not state['test_started']:
     if st.button("Start"):
         state['test_started'] = True
         state['digit_span_test'] = DigitSpanTest(starting_length=3)
         state['show_sequence'] = True
-        state['sequence_complete'] = False
-        state['user_input'] = ''  # Clear input
-        st.experimental_rerun()
+        state['feedback'] = None
+        st.rerun()
 
 else:
     digit_span_test = state['digit_span_test']
-    current_sequence = digit_span_test.get_sequence()
-    
+    mode_mapping = {"Forward": DigitSpanTest.FORWARD, "Backward": DigitSpanTest.BACKWARD}
+    selected_mode = mode_mapping[state['mode']]
+
+    # Result of the previous attempt
+    feedback = state['feedback']
+    if feedback:
+        if feedback['is_correct']:
+            st.success(feedback['message'])
+        else:
+            st.error(feedback['message'])
+
     if state['show_sequence']:
         st.write("Remember the sequence of numbers:")
-        progress_bar = st.progress(0)
-        placeholder = st.empty()
-        for i, digit in enumerate(current_sequence):
-            placeholder.write(digit)
-            progress_bar.progress((i + 1) / len(current_sequence))
-            time.sleep(1)
-            placeholder.empty()  # Clear the number display
-        state['show_sequence'] = False
-        state['sequence_complete'] = True
-        state['user_input'] = ''  # Clear the input
+
+    # Digits are shown and the response is timed in the browser, so server load
+    # and network round trips do not leak into the measured reaction times
+    result = stimulus_trial(
+        trial=state['input_key'],
+        stimuli=digit_span_test.get_sequence() if state['show_sequence'] else [],
+        stimulus_ms=1000,
+        start_delay_ms=2000 if feedback and feedback['is_correct'] else 0,  # Give user time to see the success message
+        prompt="Enter the sequence:",
+        submit_label="Submit",
+        key=f"trial_{state['input_key']}",
+    )
+
+    if result is not None:
+        time_taken = result['response_time'] / 1000
+        normalized_input = re.sub(r'[^0-9]', '', result['input'])  # Remove all non-digit characters
+        target_sequence = ''.join(digit_span_test.get_target_sequence(selected_mode))
+
+        is_correct = normalized_input == target_sequence
+        digit_span_test.record_attempt(normalized_input, time_taken, is_correct, keystrokes=result['keystrokes'])
+
+        if is_correct:
+            state['feedback'] = {'is_correct': True, 'message': f"Correct! Time taken: {time_taken:.2f} seconds. Moving to the next sequence..."}
+            digit_span_test.next()
+            state['show_sequence'] = True
+        else:
+            state['feedback'] = {'is_correct': False, 'message': f"Incorrect. Time taken: {time_taken:.2f} seconds. Try again!"}
+            state['show_sequence'] = False  # Answer the same sequence again without showing it
         state['input_key'] += 1  # Increment the input key
-        state['start_time'] = time.time()  # Set start_time here
-        st.experimental_rerun()
-
-    elif state['sequence_complete']:
-        mode_mapping = {"Forward": DigitSpanTest.FORWARD, "Backward": DigitSpanTest.BACKWARD}
-        selected_mode = mode_mapping[state['mode']]
-        
-        # Use a unique key for the input field
-        user_input = st.text_input("Enter the sequence:", key=f"user_input_{state['input_key']}")
-
-        if st.button("Submit") or user_input != state['user_input']:
-            end_time = time.time()
-            if state['start_time'] is None:
-                st.error("An error occurred. Please try again.")
-                state['start_time'] = time.time()
-            else:
-                time_taken = end_time - state['start_time']
-                
-                state['user_input'] = user_input  # Update stored user input
-                normalized_input = re.sub(r'[^0-9]', '', user_input)  # Remove all non-digit characters
-                target_sequence = ''.join(digit_span_test.get_target_sequence(selected_mode))
-
-                is_correct = normalized_input == target_sequence
-                digit_span_test.record_attempt(normalized_input, time_taken, is_correct)
-
-                if is_correct:
-                    st.success(f"Correct! Time taken: {time_taken:.2f} seconds. Moving to the next sequence...")
-                    digit_span_test.next()
-                    state['show_sequence'] = True
-                    state['sequence_complete'] = False
-                    state['user_input'] = ''  # Clear the input
-                    state['input_key'] += 1  # Increment the input key
-                    time.sleep(2)  # Give user time to see the success message
-                    st.experimental_rerun()
-                else:
-                    st.error(f"Incorrect. Time taken: {time_taken:.2f} seconds. Try again!")
-                    state['start_time'] = time.time()  # Reset start_time for next attempt
-
-        st.write(f"Current sequence length: {digit_span_test.length}")
-
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            if st.button("Restart from the beginning"):
-                state['digit_span_test'] = DigitSpanTest(starting_length=3)
-                state['show_sequence'] = True
-                state['sequence_complete'] = False
-                state['user_input'] = ''  # Clear the input
-                state['input_key'] += 1  # Increment the input key
-                state['start_time'] = None  # Reset start_time
-                st.experimental_rerun()
-        with col2:
-            if st.button("Retry current sequence"):
-                state['show_sequence'] = True
-                state['sequence_complete'] = False
-                state['user_input'] = ''  # Clear the input
-                state['input_key'] += 1  # Increment the input key
-                state['start_time'] = None  # Reset start_time
-                st.experimental_rerun()
-        with col3:
-            if st.button("Save Results"):
-                with st.spinner('Saving results to database...'):
-                    save_to_database(state['name'], state['email'], state['mode'], digit_span_test)
-
-        st.write(f"Max successful length: {digit_span_test.max_success_length}")
-        st.write(f"Accuracy: {digit_span_test.get_accuracy():.2%}")
\ No newline at end of file
+        st.rerun()
+
+    st.write(f"Current sequence length: {digit_span_test.length}")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Restart from the beginning"):
+            state['digit_span_test'] = DigitSpanTest(starting_length=3)
+            state['show_sequence'] = True
+            state['feedback'] = None
+            state['input_key'] += 1  # Increment the input key
+            st.rerun()
+    with col2:
+        if st.button("Retry current sequence"):
+            state['show_sequence'] = True
+            state['feedback'] = None
+            state['input_key'] += 1  # Increment the input key
+            st.rerun()
+    with col3:
+        if st.button("Save Results"):
+            with st.spinner('Saving results to database...'):
+                save_to_database(state['name'], state['email'], state['mode'], digit_span_test)
+
+    st.write(f"Max successful length: {digit_span_test.max_success_length}")
+    st.write(f"Accuracy: {digit_span_test.get_accuracy():.2%}")
\ No newline at end of file